@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Recall-versus-latency report for the approximate indexes in utils.ann_index.
+
+Builds a flat (exact) index plus HNSW and IVF indexes over the same vectors, then
+reports recall@k against the flat results and per-query latency for a sweep of
+efSearch / nprobe values.
+
+By default the vectors are synthetic clustered unit vectors. Pass --embeddings
+with a saved chunk-store matrix (processed/documents/<hash>/chunks.emb.npy) to measure
+real document embeddings.
+
+    python benchmarks/bench_ann.py --num-vectors 100000
+    python benchmarks/bench_ann.py --embeddings processed/documents/<hash>/chunks.emb.npy --k 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import faiss
+from utils.ann_index import build_ann_index, ivf_nlist, search
+
+EF_SEARCH_SWEEP = [16, 32, 64, 128, 256, 512]
+NPROBE_SWEEP = [1, 2, 4, 8, 16, 32, 64]
+
+
+def synthetic_embeddings(n, dim, seed=0):
+    # Clustered vectors look more like sentence embeddings than uniform noise does
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 200), dim)).astype("float32")
+    x = centers[rng.integers(0, len(centers), n)] + 0.5 * rng.standard_normal((n, dim)).astype("float32")
+    faiss.normalize_L2(x)
+    return x
+
+
+def make_queries(x, num_queries, seed=1):
+    rng = np.random.default_rng(seed)
+    q = x[rng.integers(0, len(x), num_queries)] + 0.1 * rng.standard_normal((num_queries, x.shape[1])).astype("float32")
+    faiss.normalize_L2(q)
+    return q
+
+
+def recall_at_k(truth, found):
+    hits = sum(len(set(t) & set(f[f >= 0])) for t, f in zip(truth, found))
+    return hits / truth.size
+
+
+def timed_search(index, queries, k, **params):
+    t0 = time.perf_counter()
+    _, I = search(index, queries, k, **params)
+    return I, (time.perf_counter() - t0) * 1000 / len(queries)
+
+
+def run(x, num_queries, k):
+    queries = make_queries(x, num_queries)
+    n, dim = x.shape
+    print(f"{n} vectors, dim {dim}, {num_queries} queries, recall@{k} vs flat\n")
+    print(f"{'index':<8} {'param':<14} {'build s':>8} {'recall':>8} {'ms/query':>9}")
+
+    t0 = time.perf_counter()
+    flat = build_ann_index(x, kind="flat")
+    build = time.perf_counter() - t0
+    truth, ms = timed_search(flat, queries, k)
+    print(f"{'flat':<8} {'-':<14} {build:>8.2f} {1.0:>8.3f} {ms:>9.3f}")
+
+    t0 = time.perf_counter()
+    hnsw = build_ann_index(x, kind="hnsw")
+    build = time.perf_counter() - t0
+    for ef in EF_SEARCH_SWEEP:
+        found, ms = timed_search(hnsw, queries, k, ef_search=ef)
+        print(f"{'hnsw':<8} {'efSearch=' + str(ef):<14} {build:>8.2f} {recall_at_k(truth, found):>8.3f} {ms:>9.3f}")
+
+    t0 = time.perf_counter()
+    ivf = build_ann_index(x, kind="ivf")
+    build = time.perf_counter() - t0
+    for nprobe in NPROBE_SWEEP:
+        if nprobe > ivf_nlist(n):
+            break
+        found, ms = timed_search(ivf, queries, k, nprobe=nprobe)
+        print(f"{'ivf':<8} {'nprobe=' + str(nprobe):<14} {build:>8.2f} {recall_at_k(truth, found):>8.3f} {ms:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs latency of HNSW / IVF against exact search")
+    parser.add_argument("--embeddings", help="Path to a .npy embedding matrix; synthetic vectors are used otherwise")
+    parser.add_argument("--num-vectors", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384, help="Dimension of synthetic vectors (MiniLM is 384)")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.embeddings:
+        x = np.array(np.load(args.embeddings, mmap_mode="r"), dtype="float32")
+        faiss.normalize_L2(x)
+    else:
+        x = synthetic_embeddings(args.num_vectors, args.dim)
+    run(x, args.queries, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for adaptive_chunk_markdown.
+
+Generates synthetic Docling-style markdown (headers, paragraphs, lists, tables,
+code blocks and long run-together words) at several sizes and reports
+chunks/sec and MB/s for each.
+
+    python benchmarks/bench_chunking.py
+    python benchmarks/bench_chunking.py --sizes 10KB 1MB 50MB --repeat 3
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.chunking import adaptive_chunk_markdown
+
+DEFAULT_SIZES = ["10KB", "100KB", "1MB", "10MB", "50MB"]
+
+WORDS = (
+    "the cell membrane controls which molecules enter and leave energy is stored "
+    "as glucose during photosynthesis enzymes lower the activation energy of "
+    "reactions data structures organise information so that algorithms can use it "
+    "efficiently a function maps each input to exactly one output"
+).split()
+
+# Words PDF extraction tends to glue together, which exercise word segmentation
+JOINED_WORDS = [
+    "photosynthesisprocess", "machinelearningmodels", "thermodynamicequilibrium",
+    "cellularrespiration", "differentialequations", "informationretrieval",
+]
+
+
+def parse_size(value):
+    units = {"KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+    value = value.upper()
+    for unit, factor in units.items():
+        if value.endswith(unit):
+            return int(float(value[:-len(unit)]) * factor)
+    return int(value)
+
+
+def _sentence(rnd):
+    words = [rnd.choice(WORDS) for _ in range(rnd.randint(8, 20))]
+    if rnd.random() < 0.2:
+        words[rnd.randrange(len(words))] = rnd.choice(JOINED_WORDS)
+    return " ".join(words).capitalize() + rnd.choice([".", ".", "?", "!"])
+
+
+def _block(rnd):
+    r = rnd.random()
+    if r < 0.10:
+        return "#" * rnd.randint(1, 3) + " " + _sentence(rnd)[:50].rstrip(".?!")
+    if r < 0.18:
+        body = "\n".join("    x = compute(%d)" % n for n in range(rnd.randint(3, 12)))
+        return "```python\n" + body + "\n```"
+    if r < 0.26:
+        rows = ["| Term | Value |", "|------|-------|"]
+        rows += ["| %s | %d |" % (rnd.choice(WORDS), rnd.randint(0, 999)) for _ in range(rnd.randint(2, 8))]
+        return "\n".join(rows)
+    if r < 0.36:
+        return "\n".join("- " + _sentence(rnd) for _ in range(rnd.randint(2, 6)))
+    if r < 0.40:
+        return "> " + _sentence(rnd)
+    return " ".join(_sentence(rnd) for _ in range(rnd.randint(2, 8)))
+
+
+def synthetic_markdown(size_bytes, seed=0):
+    rnd = random.Random(seed)
+    parts = []
+    total = 0
+    while total < size_bytes:
+        block = _block(rnd)
+        parts.append(block)
+        total += len(block) + 2
+    return "\n\n".join(parts)
+
+
+def run(sizes, repeat):
+    # Load the word segmentation tables before timing anything
+    adaptive_chunk_markdown(text=synthetic_markdown(4096, seed=1))
+    print(f"{'size':>8} {'chunks':>9} {'seconds':>9} {'chunks/s':>11} {'MB/s':>8}")
+    for label in sizes:
+        text = synthetic_markdown(parse_size(label))
+        mb = len(text.encode("utf-8")) / 1024 ** 2
+        best = None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            chunks = adaptive_chunk_markdown(text=text)
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{label:>8} {len(chunks):>9} {best:>9.3f} {len(chunks) / best:>11.1f} {mb / best:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark adaptive_chunk_markdown throughput")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="Input sizes, e.g. 10KB 1MB 50MB")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per size; the fastest is reported")
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
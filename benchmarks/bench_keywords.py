@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the corpus-level keyword engine (utils.extract_keywords).
+
+Generates chunks of cleaned tokens drawn from a Zipf-like vocabulary, with a few
+planted multi-word terms, and reports tokens/s for counting + ranking at several
+document sizes. Time should grow linearly with the number of tokens.
+
+    python benchmarks/bench_keywords.py
+    python benchmarks/bench_keywords.py --tokens 100000 1000000 10000000 --repeat 3
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.extract_keywords import extract_corpus_keywords
+
+DEFAULT_TOKENS = [100_000, 1_000_000, 5_000_000]
+CHUNK_TOKENS = 150
+VOCAB_SIZE = 50_000
+PHRASES = [["neural", "network"], ["gradient", "descent"], ["cell", "membrane"], ["supply", "chain"]]
+
+
+def synthetic_chunks(num_tokens, seed=0):
+    rnd = random.Random(seed)
+    vocab = [f"term{i}" for i in range(VOCAB_SIZE)]
+    weights = [1 / (rank + 1) for rank in range(VOCAB_SIZE)]
+    chunks = []
+    for _ in range(max(1, num_tokens // CHUNK_TOKENS)):
+        tokens = rnd.choices(vocab, weights=weights, k=CHUNK_TOKENS)
+        for _ in range(rnd.randint(0, 3)):
+            i = rnd.randrange(CHUNK_TOKENS - 1)
+            tokens[i:i + 2] = rnd.choice(PHRASES)
+        chunks.append(tokens)
+    return chunks
+
+
+def run(sizes, repeat, top_n):
+    print(f"{'tokens':>10} {'chunks':>8} {'seconds':>9} {'tokens/s':>12}")
+    for num_tokens in sizes:
+        chunks = synthetic_chunks(num_tokens)
+        best = None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            ranked = extract_corpus_keywords(chunks, top_n=top_n)
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        total = sum(len(c) for c in chunks)
+        print(f"{total:>10} {len(chunks):>8} {best:>9.3f} {total / best:>12.0f}")
+    print("top terms:", ", ".join(term for term, _ in ranked[:8]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark corpus-level keyword extraction")
+    parser.add_argument("--tokens", nargs="+", type=int, default=DEFAULT_TOKENS, help="Document sizes in tokens")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per size; the fastest is reported")
+    parser.add_argument("--top-n", type=int, default=100, help="Ranked terms to return")
+    args = parser.parse_args()
+    run(args.tokens, args.repeat, args.top_n)
+
+
+if __name__ == "__main__":
+    main()
@@ -54,6 +54,53 @@ const ChatInterface = () => {
         }
     }, [currentFile]);
 
+    const updateLastMessage = (update) => {
+        setMessages(prev => {
+            const next = [...prev];
+            next[next.length - 1] = { ...next[next.length - 1], ...update(next[next.length - 1]) };
+            return next;
+        });
+    };
+
+    // Server-Sent Events from /api/chat: `sources` first, then `token` events, then `done` or `error`
+    const readChatStream = async (response) => {
+        setMessages(prev => [...prev, { role: 'assistant', content: '', sources: [], streaming: true }]);
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        const handleEvent = (raw) => {
+            let event = 'message';
+            let data = '';
+            for (const line of raw.split('\n')) {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            }
+            const payload = data ? JSON.parse(data) : {};
+            if (event === 'sources') {
+                updateLastMessage(() => ({ sources: payload.sources || [] }));
+            } else if (event === 'token') {
+                updateLastMessage(msg => ({ content: msg.content + payload.text }));
+            } else if (event === 'error') {
+                updateLastMessage(msg => ({ content: (msg.content ? msg.content + '\n\n' : '') + `Error: ${payload.error}` }));
+            }
+        };
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                handleEvent(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+            }
+        }
+
+        updateLastMessage(msg => ({ streaming: false, content: msg.content || 'No response received.' }));
+    };
+
     const handleSubmit = async (e) => {
         e.preventDefault();
         const sendMessage = async () => {
@@ -71,17 +118,24 @@ const ChatInterface = () => {
                     body: JSON.stringify({
                         filename: currentFile.filename,
                         message: input, // Send only current message
+                        stream: true,
                     }),
                 });
 
-                const data = await response.json();
-                const assistantMessage = {
-                    role: 'assistant',
-                    content: data.response || 'No response received.',
-                    sources: data.sources || []
-                };
+                const contentType = response.headers.get('content-type') || '';
+                if (contentType.includes('text/event-stream')) {
+                    await readChatStream(response);
+                } else {
+                    // Commands like /summarize still answer with a single JSON body
+                    const data = await response.json();
+                    const assistantMessage = {
+                        role: 'assistant',
+                        content: data.response || 'No response received.',
+                        sources: data.sources || []
+                    };
 
-                setMessages(prev => [...prev, assistantMessage]);
+                    setMessages(prev => [...prev, assistantMessage]);
+                }
             } catch (error) {
                 console.error('Error:', error);
                 setMessages(prev => [...prev, {
@@ -161,7 +215,7 @@ const ChatInterface = () => {
                         </div>
                     </motion.div>
                 ))}
-                {isLoading && (
+                {isLoading && !messages[messages.length - 1]?.streaming && (
                     <div className="flex gap-4">
                         <div className="w-10 h-10 rounded-full bg-gradient-to-br from-purple-100 to-blue-100 border-2 border-purple-200 flex items-center justify-center shrink-0 overflow-hidden">
                             <img src="/assets/thinking_logo.png" alt="Thinking" className="w-8 h-8 object-contain" />
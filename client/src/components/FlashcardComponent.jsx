@@ -3,6 +3,7 @@ import { CreditCard, ChevronLeft, ChevronRight, RotateCw, Loader2 } from 'lucide
 import { useFile } from '../context/FileContext';
 import { useCache } from '../context/CacheContext';
 import { motion, AnimatePresence } from 'framer-motion';
+import { readNdjson } from '../lib/utils';
 
 const FlashcardComponent = () => {
     const { currentFile } = useFile();
@@ -23,17 +24,25 @@ const FlashcardComponent = () => {
         if (!currentFile) return;
         setIsLoading(true);
         try {
-            const response = await fetch('/api/flashcards', {
+            const response = await fetch('/api/flashcards/stream', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({ filename: currentFile.filename }),
             });
-            const data = await response.json();
-            const result = data.result || [];
+            // Items arrive chunk by chunk, so the first ones can be used before the document is done
+            let result = [];
             setFlashcards(result);
-            updateCache('flashcards', result);
             setCurrentIndex(0);
             setIsFlipped(false);
+            await readNdjson(response, (line) => {
+                if (line.type === 'chunk') {
+                    result = [...result, ...line.items];
+                    setFlashcards(result);
+                } else if (line.type === 'error') {
+                    console.error(line.error);
+                }
+            });
+            updateCache('flashcards', result);
         } catch (error) {
             console.error(error);
         } finally {
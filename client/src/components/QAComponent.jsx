@@ -3,6 +3,7 @@ import { Brain, ChevronDown, ChevronUp, Loader2 } from 'lucide-react';
 import { useFile } from '../context/FileContext';
 import { useCache } from '../context/CacheContext';
 import { motion, AnimatePresence } from 'framer-motion';
+import { readNdjson } from '../lib/utils';
 
 const QAComponent = () => {
     const { currentFile } = useFile();
@@ -22,14 +23,22 @@ const QAComponent = () => {
         if (!currentFile) return;
         setIsLoading(true);
         try {
-            const response = await fetch('/api/questions', {
+            const response = await fetch('/api/questions/stream', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({ filename: currentFile.filename }),
             });
-            const data = await response.json();
-            const result = data.result || [];
+            // Items arrive chunk by chunk, so the first ones can be used before the document is done
+            let result = [];
             setQuestions(result);
+            await readNdjson(response, (line) => {
+                if (line.type === 'chunk') {
+                    result = [...result, ...line.items];
+                    setQuestions(result);
+                } else if (line.type === 'error') {
+                    console.error(line.error);
+                }
+            });
             updateCache('questions', result);
         } catch (error) {
             console.error(error);
@@ -1,33 +1,197 @@
 import os
-from openai import OpenAI
+import threading
+import time
+from collections import OrderedDict
+import httpx
+from openai import OpenAI, RateLimitError
+from model_init.rate_limit import get_rate_limiter, estimate_tokens, backoff_delay, MAX_RETRIES
+from model_init.response_cache import get_response_cache, make_cache_key
 
 # Default configuration (can be overridden)
 DEFAULT_API_KEY = ""
 DEFAULT_BASE_URL = "https://api.groq.com/openai/v1"
 DEFAULT_MODEL_NAME = "llama-3.1-8b-instant"
 
+# Client pool: one OpenAI client (and so one keep-alive HTTP connection pool) per (api_key, base_url)
+MAX_CACHED_CLIENTS = int(os.environ.get("VILO_LLM_MAX_CLIENTS", "16"))
+HTTP_MAX_CONNECTIONS = int(os.environ.get("VILO_LLM_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("VILO_LLM_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("VILO_LLM_KEEPALIVE_EXPIRY", "60"))
+HTTP_TIMEOUT = float(os.environ.get("VILO_LLM_TIMEOUT", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("VILO_LLM_CONNECT_TIMEOUT", "10"))
+
+_clients = OrderedDict()
+_clients_lock = threading.Lock()
+_client_stats = {
+    "clients_created": 0,
+    "client_reuses": 0,
+    "clients_evicted": 0,
+    "http_requests": 0,
+    "connections_opened": 0,
+}
+
+def _count_connection(event_name, info):
+    # httpcore trace callback: fires once per new TCP connection, never for a reused keep-alive one
+    if event_name == "connection.connect_tcp.complete":
+        with _clients_lock:
+            _client_stats["connections_opened"] += 1
+
+def _on_request(request):
+    with _clients_lock:
+        _client_stats["http_requests"] += 1
+    request.extensions["trace"] = _count_connection
+
+def _build_http_client():
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        event_hooks={"request": [_on_request]},
+    )
+
 def get_client(api_key=None, base_url=None):
     """
-    Initialize and return an OpenAI client.
+    Return a cached OpenAI client for (api_key, base_url), creating it on first use.
+    Least recently used clients are dropped beyond MAX_CACHED_CLIENTS.
     """
-    return OpenAI(
-        base_url=base_url or DEFAULT_BASE_URL,
-        api_key=api_key or DEFAULT_API_KEY,
-    )
+    key = (api_key or DEFAULT_API_KEY, base_url or DEFAULT_BASE_URL)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is not None:
+            _clients.move_to_end(key)
+            _client_stats["client_reuses"] += 1
+            return client
+
+        client = OpenAI(
+            base_url=key[1],
+            api_key=key[0],
+            http_client=_build_http_client(),
+            # Retries on 429 are handled below so they go through the key's rate limiter
+            max_retries=0,
+        )
+        _clients[key] = client
+        _client_stats["clients_created"] += 1
+        while len(_clients) > MAX_CACHED_CLIENTS:
+            # Not closed explicitly: another thread may still be mid-request on it
+            _clients.popitem(last=False)
+            _client_stats["clients_evicted"] += 1
+        return client
+
+def client_pool_stats():
+    with _clients_lock:
+        stats = dict(_client_stats)
+        stats["cached_clients"] = len(_clients)
+    stats["connections_reused"] = max(0, stats["http_requests"] - stats["connections_opened"])
+    return stats
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    return response.headers.get("retry-after")
+
+class ModelError(Exception):
+    """A failed streaming call; raised by stream_model, whose partial output cannot carry an error string."""
+
+def is_error_response(text):
+    """True for the "Error: ..." strings query_model returns instead of raising."""
+    return text is None or text.lstrip().startswith("Error:")
 
-def query_model(prompt, api_key=None, model_name=None, base_url=None, temperature=0):
+def query_model(prompt, api_key=None, model_name=None, base_url=None, temperature=0, use_cache=True):
     """
     Query the model with a prompt.
+    Calls wait for the API key's requests/tokens-per-minute budget and back off on 429 responses.
+    Responses are served from / stored in the persistent response cache unless use_cache=False.
     """
+    model = model_name or DEFAULT_MODEL_NAME
+    cache = get_response_cache() if use_cache else None
+    cache_key = None
+    if cache is not None:
+        cache_key = make_cache_key(model, base_url or DEFAULT_BASE_URL, prompt, temperature=temperature)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
     client = get_client(api_key, base_url)
+    rate_limiter = get_rate_limiter(api_key or DEFAULT_API_KEY)
+
+    for attempt in range(1, MAX_RETRIES + 2):
+        reservation = rate_limiter.acquire(estimate_tokens(prompt))
+        try:
+            response = client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature
+            )
+            if getattr(response, "usage", None) is not None:
+                rate_limiter.adjust(reservation, response.usage.total_tokens)
+            content = response.choices[0].message.content
+            if cache is not None and content is not None:
+                cache.set(cache_key, content)
+            return content
+        except RateLimitError as e:
+            if attempt > MAX_RETRIES:
+                return f"Error: {str(e)}"
+            delay = backoff_delay(attempt, _retry_after(e))
+            print(f"Rate limited (429), retrying in {delay:.1f}s (attempt {attempt}/{MAX_RETRIES})")
+            time.sleep(delay)
+        except Exception as e:
+            return f"Error: {str(e)}"
+
+def stream_model(prompt, api_key=None, model_name=None, base_url=None, temperature=0, use_cache=True):
+    """
+    Like query_model, but yields the answer text piece by piece as the model generates it.
+    A cached response is yielded in one piece. 429s are retried only before the first token.
+    Failures raise ModelError (possibly after some text was yielded); nothing is cached then.
+    """
     model = model_name or DEFAULT_MODEL_NAME
-    
+    cache = get_response_cache() if use_cache else None
+    cache_key = None
+    if cache is not None:
+        cache_key = make_cache_key(model, base_url or DEFAULT_BASE_URL, prompt, temperature=temperature)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    client = get_client(api_key, base_url)
+    rate_limiter = get_rate_limiter(api_key or DEFAULT_API_KEY)
+
+    for attempt in range(1, MAX_RETRIES + 2):
+        rate_limiter.acquire(estimate_tokens(prompt))
+        try:
+            stream = client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                stream=True
+            )
+            break
+        except RateLimitError as e:
+            if attempt > MAX_RETRIES:
+                raise ModelError(str(e)) from e
+            delay = backoff_delay(attempt, _retry_after(e))
+            print(f"Rate limited (429), retrying in {delay:.1f}s (attempt {attempt}/{MAX_RETRIES})")
+            time.sleep(delay)
+        except Exception as e:
+            raise ModelError(str(e)) from e
+
+    parts = []
     try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature
-        )
-        return response.choices[0].message.content
+        for event in stream:
+            if not event.choices:
+                continue
+            delta = event.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
     except Exception as e:
-        return f"Error: {str(e)}"
+        raise ModelError(str(e)) from e
+    finally:
+        stream.close()
+
+    if cache is not None and parts:
+        cache.set(cache_key, "".join(parts))
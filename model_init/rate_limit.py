@@ -0,0 +1,104 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+
+# Groq's published limits for llama-3.1-8b-instant on the free tier, enforced per API key;
+# each key gets its own budget of this size. 0 disables a limit
+DEFAULT_REQUESTS_PER_MINUTE = int(os.environ.get("VILO_LLM_RPM", "30"))
+DEFAULT_TOKENS_PER_MINUTE = int(os.environ.get("VILO_LLM_TPM", "6000"))
+
+# Completion tokens assumed per call before the real usage is known
+EXPECTED_COMPLETION_TOKENS = 300
+
+MAX_RETRIES = int(os.environ.get("VILO_LLM_MAX_RETRIES", "5"))
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+
+def estimate_tokens(prompt):
+    # ~4 characters per token for English text
+    return len(prompt) // 4 + EXPECTED_COMPLETION_TOKENS
+
+
+class RateLimiter:
+    """
+    Sliding one-minute window over requests and tokens for one API key, shared by all threads.
+    acquire() blocks until both budgets have room for the call.
+    """
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._calls = deque()  # [timestamp, tokens]
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def _prune(self, now):
+        while self._calls and now - self._calls[0][0] >= 60:
+            self._calls.popleft()
+
+    def _wait_time(self, now, tokens):
+        waits = [0.0]
+        if self.requests_per_minute and len(self._calls) >= self.requests_per_minute:
+            waits.append(60 - (now - self._calls[len(self._calls) - self.requests_per_minute][0]))
+        if self.tokens_per_minute:
+            # A single call larger than the whole budget only waits for an empty window
+            tokens = min(tokens, self.tokens_per_minute)
+            used = sum(t for _, t in self._calls)
+            for ts, t in self._calls:
+                if used + tokens <= self.tokens_per_minute:
+                    break
+                used -= t
+                waits.append(60 - (now - ts))
+        return max(waits)
+
+    def acquire(self, tokens):
+        """
+        Reserve budget for one call of ~`tokens` tokens. Returns a handle for adjust().
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._prune(now)
+                wait = self._wait_time(now, tokens)
+                if wait <= 0:
+                    entry = [now, tokens]
+                    self._calls.append(entry)
+                    return entry
+                self.waited_seconds += wait
+            time.sleep(wait)
+
+    def adjust(self, entry, actual_tokens):
+        """Replace the estimate for a call with the token count the API reported."""
+        with self._lock:
+            entry[1] = actual_tokens
+
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Seconds to sleep before retry number `attempt` (1-based): the server's
+    Retry-After if given, else exponential backoff with jitter.
+    """
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), BACKOFF_MAX_SECONDS)
+        except (TypeError, ValueError):
+            pass
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempt - 1), BACKOFF_MAX_SECONDS)
+    return delay * (0.5 + random.random() / 2)
+
+
+# One limiter per API key, used by model_init.model.query_model / stream_model
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(api_key=None):
+    """The limiter for an API key's budget, created on first use."""
+    key = api_key or ""
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(key)
+        if limiter is None:
+            limiter = _rate_limiters[key] = RateLimiter()
+        return limiter
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# Persistent cache of LLM responses; set VILO_LLM_CACHE=0 to turn it off
+CACHE_ENABLED = os.environ.get("VILO_LLM_CACHE", "1") != "0"
+CACHE_PATH = Path(os.environ.get(
+    "VILO_LLM_CACHE_PATH",
+    Path(__file__).parent.parent / "processed" / "llm_cache.sqlite",
+))
+CACHE_MAX_ENTRIES = int(os.environ.get("VILO_LLM_CACHE_MAX_ENTRIES", "20000"))
+CACHE_TTL_SECONDS = float(os.environ.get("VILO_LLM_CACHE_TTL", "0"))  # 0 = never expire
+
+# Eviction runs every this many inserts rather than on each one
+EVICT_EVERY = 100
+
+
+def make_cache_key(model, base_url, prompt, **params):
+    payload = json.dumps({"model": model, "base_url": base_url, "prompt": prompt, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed key -> response store with LRU eviction and optional TTL.
+    Safe to share between threads (one connection per thread) and processes (SQLite locking).
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES, ttl_seconds=CACHE_TTL_SECONDS):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._inserts = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._conn()
+        row = conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            conn.commit()
+            row = None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        conn.commit()
+        return row[0]
+
+    def set(self, key, response):
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, response, created, last_access) VALUES (?, ?, ?, ?)",
+            (key, response, now, now),
+        )
+        conn.commit()
+        with self._lock:
+            self._inserts += 1
+            run_eviction = self._inserts % EVICT_EVERY == 0
+        if run_eviction:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones beyond max_entries."""
+        conn = self._conn()
+        removed = 0
+        if self.ttl_seconds:
+            removed += conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_seconds,)).rowcount
+        if self.max_entries:
+            removed += conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+        conn.commit()
+        with self._lock:
+            self.evictions += removed
+        return removed
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM responses")
+        conn.commit()
+
+    def stats(self):
+        entries = self._conn().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": CACHE_ENABLED,
+                "path": str(self.path),
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """The process-wide cache, opened on first use; None when disabled."""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
@@ -9,8 +9,12 @@ import os
 # Add the project root to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+# Import first so startup timings are measured from process start
+from utils import startup
+
 # Import and run the ml_service
 from src.ml_service import app
 
 if __name__ == '__main__':
+    print(f"ML service ready in {startup.startup_report()['events']['app_ready']:.2f}s ({startup.STARTUP_MODE} startup)")
     app.run(debug=True, port=5001)
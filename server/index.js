@@ -53,6 +53,11 @@ app.use('/api', async (req, res) => {
     const url = `${ML_SERVICE_URL}/api${req.path}`;
     console.log(`Proxying request to: ${url}`);
 
+    // Streaming requests (chat with { stream: true }, NDJSON */stream endpoints) are piped through unbuffered
+    if ((req.body && req.body.stream) || req.path.endsWith('/stream')) {
+        return proxyStream(req, res, url);
+    }
+
     try {
         const response = await axios({
             method: req.method,
@@ -71,6 +76,41 @@ app.use('/api', async (req, res) => {
     }
 });
 
+async function proxyStream(req, res, url) {
+    try {
+        const response = await axios({
+            method: req.method,
+            url: url,
+            data: req.body,
+            headers: { 'Content-Type': 'application/json' },
+            responseType: 'stream',
+            decompress: false
+        });
+
+        res.status(response.status);
+        res.setHeader('Content-Type', response.headers['content-type'] || 'application/octet-stream');
+        res.setHeader('Cache-Control', 'no-cache');
+        res.setHeader('X-Accel-Buffering', 'no');
+        res.flushHeaders();
+
+        // Stop generating upstream if the browser goes away
+        res.on('close', () => response.data.destroy());
+        response.data.pipe(res);
+    } catch (error) {
+        console.error('Error proxying stream to ML service:', error.message);
+        if (error.response) {
+            // Error bodies are small JSON; collect and forward them
+            let body = '';
+            error.response.data.on('data', (chunk) => { body += chunk; });
+            error.response.data.on('end', () => {
+                res.status(error.response.status).type('application/json').send(body);
+            });
+        } else {
+            res.status(500).json({ error: 'ML Service unavailable' });
+        }
+    }
+}
+
 // Serve React App (Production)
 // For dev, we use Vite server.
 // app.use(express.static(path.join(__dirname, '../client/dist')));
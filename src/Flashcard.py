@@ -1,33 +1,37 @@
-from utils.read_file import read_file_to_text
-from src.QA import extract_pages_from_chunk
-from utils.chunking import adaptive_chunk_markdown
-from utils.flashcards_per_chunk import generate_flashcards_per_chunk
+from src.document_session import get_session
+from utils.flashcards_per_chunk import generate_flashcards_per_chunk, build_flashcard_batch_prompt
+from utils.batched_generation import generate_batched, iter_batched
+
+def flashcard_chunk_locations(file_path):
+    """(location, text) for every chunk of a PDF / Word file."""
+    if not file_path.endswith((".pdf", ".docx")):
+        raise ValueError("Unsupported file type. Use PDF or DOCX.")
+    return get_session(file_path).chunk_locations()
+
+def _generate_single(api_key, history):
+    def generate(text, location_str):
+        return generate_flashcards_per_chunk(text, api_key, location=location_str, history=history)
+    return generate
 
 #  Full PDF / Word pipeline using  utils
-def flashcard_pipeline(file_path, api_key, history=None):
-    md_text = read_file_to_text(file_path)
-    chunks = adaptive_chunk_markdown(text = md_text)
+def flashcard_pipeline(file_path, api_key, history=None, max_concurrency=None, progress=None):
+    tasks = flashcard_chunk_locations(file_path)
+
+    # Several chunks per prompt, sent concurrently; results come back in chunk order
     all_flashcards = []
+    for flashcards in generate_batched(tasks, build_flashcard_batch_prompt, _generate_single(api_key, history), api_key,
+                                       max_concurrency=max_concurrency, progress=progress):
+        if flashcards:
+            all_flashcards.extend(flashcards)
+    return all_flashcards
 
-    if file_path.endswith(".pdf"):
-        for chunk in chunks:
-            text = chunk['text']
-            pages = extract_pages_from_chunk(text)
-            location_str = f"Pages {', '.join(map(str, pages))}"
-            flashcards = generate_flashcards_per_chunk(text, api_key, location=location_str, history=history)
-            if flashcards:
-                all_flashcards.extend(flashcards)
-        return all_flashcards
-    
-    elif file_path.endswith(".docx"):
-        for i, chunk in enumerate(chunks):
-            text = chunk['text']
-            location_str = f"Chunk {i + 1}"
-            flashcards = generate_flashcards_per_chunk(text, api_key, location=location_str, history=history)
-            if flashcards:
-                all_flashcards.extend(flashcards)
-        return all_flashcards
+def iter_flashcard_pipeline(file_path, api_key, history=None, max_concurrency=None):
+    """
+    Generator version of flashcard_pipeline: yields one dict per chunk as soon as its flashcards
+    are parsed ({"chunk", "total", "location", "items"}), in completion order.
+    """
+    tasks = flashcard_chunk_locations(file_path)
 
-    else:
-        raise ValueError("Unsupported file type. Use PDF or DOCX.")
-    
\ No newline at end of file
+    for i, flashcards in iter_batched(tasks, build_flashcard_batch_prompt, _generate_single(api_key, history), api_key,
+                                      max_concurrency=max_concurrency):
+        yield {"chunk": i, "total": len(tasks), "location": tasks[i][0], "items": flashcards or []}
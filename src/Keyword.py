@@ -1,32 +1,45 @@
-from utils.chunking import adaptive_chunk_markdown
+import os
 from utils.clean_text import clean_text
-from utils.read_file import read_file_to_text
-from utils.extract_keywords import extract_keywords
+from src.document_session import get_session
+from utils.extract_keywords import extract_corpus_keywords
+from utils.keyword_ranking import rank_keywords, format_keyword_sections
 from utils.refine_keywords_AI import refine_keywords_AI
+from model_init.model import is_error_response
 
-def keyword_pipeline(file_path, api_key):
-    """Reads PDF/DOCX + extracts smart keywords."""
-
-    text = read_file_to_text(file_path)
-    text = clean_text(text)
-
-    # Chunk text
-    chunks = adaptive_chunk_markdown(text=text)
+# Send the locally ranked shortlist to the LLM for a final pass (off by default: no LLM call)
+REFINE_WITH_LLM = os.environ.get("VILO_KEYWORD_REFINE", "0") == "1"
 
-    all_keywords = []
-
-    # Extract keywords per chunk
-    for chunk in chunks:
-        kws = extract_keywords(chunk['text'])
-        all_keywords.extend(kws)
-
-    # Deduplicate
-    all_keywords = list(dict.fromkeys(all_keywords))
+def keyword_pipeline(file_path, api_key, progress=None, refine=None):
+    """Reads PDF/DOCX + extracts smart keywords."""
 
-     # USE AI FOR FINAL CLEANING
-    ai_refined = refine_keywords_AI(all_keywords, api_key)
+    session = get_session(file_path)
+    chunks = session.chunks
+
+    # Count terms over the whole document in one pass, so scores use document-wide statistics
+    token_lists = (clean_text(chunk['text']).split() for chunk in chunks)
+    ranked = extract_corpus_keywords(token_lists, progress=progress, total=len(chunks))
+    all_keywords = [term for term, _ in ranked]
+
+    # Rank and group the candidates locally against the stored chunk embeddings
+    sections = rank_keywords(ranked, session.embeddings)
+    local_ranked = format_keyword_sections(sections)
+
+    # Optional LLM pass over the shortlist only
+    if refine is None:
+        refine = REFINE_WITH_LLM
+    ai_refined = None
+    if refine:
+        shortlist = [term for terms in sections.values() for term in terms]
+        ai_refined = refine_keywords_AI(shortlist, api_key)
+        if is_error_response(ai_refined):
+            # The local sections are still a complete answer
+            print(f"Keyword refinement failed, using local ranking: {ai_refined}")
+            ai_refined = None
 
     return {
         "raw_keywords": all_keywords,
-        "ai_refined": ai_refined
+        "sections": sections,
+        "local_ranked": local_ranked,
+        "ai_refined": ai_refined,
+        "markdown": ai_refined or local_ranked,
     }
@@ -0,0 +1,146 @@
+import os
+from pathlib import Path
+import numpy as np
+from utils.embeddings import encode_texts
+from utils.hybird_search import dense_scores, bm25_scores, top_k_indices, fuse_scores
+from utils.llm_executor import map_concurrently
+from src.RAG_System import load_document_index, format_rag_prompt
+from model_init.model import query_model, stream_model
+
+# Documents searched in parallel; each one is an independent index shard
+LIBRARY_WORKERS = int(os.environ.get("VILO_LIBRARY_WORKERS", "4"))
+# Candidates each shard contributes to the merge, as a multiple of top_k
+SHARD_CANDIDATE_FACTOR = 3
+
+LIBRARY_EXTENSIONS = (".pdf", ".docx")
+
+
+def list_library(upload_folder):
+    """Uploaded documents that can be searched, sorted by name."""
+    folder = Path(upload_folder)
+    if not folder.exists():
+        return []
+    return sorted(p.name for p in folder.iterdir() if p.is_file() and p.suffix.lower() in LIBRARY_EXTENSIONS)
+
+
+def _search_shard(file_path, query, query_embedding, pool, alpha, output_folder, ef_search, nprobe):
+    """
+    Top `pool` chunks of one document with their raw dense and BM25 scores.
+    Raw scores are returned (not the shard-local fused score) so the merge can
+    normalize them over all shards together.
+    """
+    chunks, faiss_index, bm25, _ = load_document_index(file_path, output_folder)
+    if not chunks:
+        return []
+    dense = dense_scores([query], faiss_index, len(chunks), query_embedding, pool, ef_search, nprobe)
+    sparse = bm25_scores([query], bm25)
+    fused = fuse_scores(dense, sparse, alpha)
+    top = top_k_indices(fused, min(pool, len(chunks)))[0]
+    document = Path(file_path).name
+    return [(document, chunks[i], float(dense[0, i]), float(sparse[0, i])) for i in top]
+
+
+def library_search(
+    file_paths,
+    query: str,
+    top_k: int = 5,
+    alpha: float = 0.5,
+    output_folder: str = None,
+    max_workers: int = None,
+    ef_search: int = None,
+    nprobe: int = None
+):
+    """
+    Hybrid search across several documents. Each document is searched as its own shard
+    (in parallel), then candidates are re-scored together and the global top_k is returned.
+    Returned chunks carry `document` and `score` in their metadata.
+    """
+    file_paths = list(file_paths)
+    if not file_paths or top_k <= 0:
+        return []
+
+    # The query is embedded once and shared by every shard
+    query_embedding = encode_texts([query], normalize=True, verbose=False)
+    pool = top_k * SHARD_CANDIDATE_FACTOR
+
+    def search(path):
+        try:
+            return _search_shard(path, query, query_embedding, pool, alpha, output_folder, ef_search, nprobe)
+        except Exception as e:
+            print(f"Library search skipped {path}: {e}")
+            return []
+
+    shard_results = map_concurrently(search, file_paths, max_concurrency=max_workers or LIBRARY_WORKERS)
+    candidates = [c for shard in shard_results for c in shard]
+    if not candidates:
+        return []
+
+    # Normalize over the union of shard candidates so scores from different documents are comparable
+    dense = np.array([[c[2] for c in candidates]], dtype='float32')
+    sparse = np.array([[c[3] for c in candidates]], dtype='float32')
+    fused = fuse_scores(dense, sparse, alpha)
+    top = top_k_indices(fused, min(top_k, len(candidates)))[0]
+
+    results = []
+    for i in top:
+        document, chunk, _, _ = candidates[i]
+        metadata = {**chunk.get("metadata", {}), "document": document, "score": round(float(fused[0, i]), 4)}
+        results.append({**chunk, "metadata": metadata})
+    return results
+
+
+def build_library_prompt(
+    file_paths,
+    query: str,
+    output_folder: str = None,
+    top_k: int = 5,
+    alpha: float = 0.5,
+    history: list = None,
+    ef_search: int = None,
+    nprobe: int = None
+):
+    best_chunks = library_search(file_paths, query, top_k=top_k, alpha=alpha, output_folder=output_folder, ef_search=ef_search, nprobe=nprobe)
+
+    # Label every passage with where it came from so answers can span documents
+    context_text = "\n\n".join(
+        f"[{c['metadata']['document']} - {c['metadata'].get('header', 'Root')}]\n{c['text']}" for c in best_chunks
+    )
+
+    return format_rag_prompt(context_text, query, history), best_chunks
+
+
+def run_library_pipeline(
+    file_paths,
+    query: str,
+    output_folder: str = None,
+    top_k: int = 5,
+    alpha: float = 0.5,
+    api_key: str = None,
+    history: list = None,
+    ef_search: int = None,
+    nprobe: int = None
+):
+    full_prompt, best_chunks = build_library_prompt(file_paths, query, output_folder, top_k, alpha, history, ef_search, nprobe)
+
+    answer = query_model(full_prompt, api_key=api_key)
+
+    return answer, best_chunks
+
+
+def stream_library_pipeline(
+    file_paths,
+    query: str,
+    output_folder: str = None,
+    top_k: int = 5,
+    alpha: float = 0.5,
+    api_key: str = None,
+    history: list = None,
+    ef_search: int = None,
+    nprobe: int = None
+):
+    """Same events as stream_rag_pipeline: ("sources", best_chunks) then ("token", text)."""
+    full_prompt, best_chunks = build_library_prompt(file_paths, query, output_folder, top_k, alpha, history, ef_search, nprobe)
+    yield "sources", best_chunks
+
+    for text in stream_model(full_prompt, api_key=api_key):
+        yield "token", text
@@ -1,49 +1,18 @@
 from model_init.model import query_model
-from langchain_community.document_loaders import PyPDFLoader
-
-from utils.chunking import adaptive_chunk_markdown
-from langchain_community.document_loaders import Docx2txtLoader
+from src.document_session import get_session
+from utils.batched_generation import generate_batched, iter_batched, format_batch_chunks
 import json
-import re
-
-
-# --- Read Files Functions ---
-
-# Read the data from the PDF
-def read_pdf(file_path):
-    loader = PyPDFLoader(file_path)
-    docs = loader.load()   # list of pages
-    return docs            # each doc has metadata["page"]
-
-# Merge the pages from PDFs
-def merge_pages(docs):
-    full_text = ""
-    for doc in docs:
-        page_num = doc.metadata["page"]
-        full_text += f"\n[PAGE:{page_num}]\n" + doc.page_content
-    return full_text
-
-# Read the data from Doc
-def read_word(file_path):
-    loader = Docx2txtLoader(file_path)
-    docs = loader.load()
-    full_text = docs[0].page_content
-    return full_text
-
-# Extract used pages to make Questions from PDFs
-def extract_pages_from_chunk(chunk_text):
-    pages = re.findall(r"\[PAGE:(\d+)\]", chunk_text)
-    pages = list(sorted(set(map(int, pages))))  # unique, sorted
-    return pages
 
 
 # --- Generate Questions and Answers ---
 
-def generate_qa_per_chunk(chunk_text, api_key, location=None, history=None):
+def question_count(chunk_text):
     # Determine number of questions based on length
     # e.g., 1 question per 300 characters, min 2, max 5
-    text_len = len(chunk_text)
-    num_questions = max(2, min(5, text_len // 300))
+    return max(2, min(5, len(chunk_text) // 300))
+
+def generate_qa_per_chunk(chunk_text, api_key, location=None, history=None):
+    num_questions = question_count(chunk_text)
 
     # Build location label for prompt
     location_label = f"Location: {location}" if location else ""
@@ -111,45 +80,69 @@ def generate_qa_per_chunk(chunk_text, api_key, location=None, history=None):
         return []
 
 
-# --- Functions for PDF or Word ---
-def pdf_to_qa(file_path, api_key, history=None):
-    pages = read_pdf(file_path)          
-    full_text = merge_pages(pages)       
-    chunks = adaptive_chunk_markdown(text=full_text)       
+def build_qa_batch_prompt(batch):
+    """One prompt for several chunks; the reply is a JSON object keyed by chunk id."""
+    chunks_text = format_batch_chunks(
+        batch, lambda text: f"Write {question_count(text)} questions for this chunk.")
 
-    all_qas = []
+    return f"""
+    You are an AI question generator. Below are several text chunks, each with a chunk id.
+    For each chunk, create the requested number of **high-quality questions** based only on that chunk.
 
-    for chunk in chunks:
-        text = chunk['text']
-        pages = extract_pages_from_chunk(text)
-        # Convert pages list to string for location
-        location_str = f"Pages {', '.join(map(str, pages))}"
-        
-        qa_list = generate_qa_per_chunk(text, api_key, location=location_str, history=history)
-        if qa_list:
-            all_qas.extend(qa_list)
+    Mix the question types:
+    - At least one **True/False** question per chunk.
+    - The rest should be **Short Answer** questions.
 
-    return all_qas
+    Questions must focus on the **main idea**, not minor or irrelevant details.
+    If a chunk is empty, extremely short, or contains no meaningful information, give it an empty list.
 
-def word_to_qa(file_path, api_key, history=None):
-    full_text = read_word(file_path)
-    chunks = adaptive_chunk_markdown(text=full_text)
+    Return the output strictly as a valid JSON object that maps every chunk id to a JSON array of objects:
+    {{
+        "c1": [
+            {{
+                "question": "The question text here",
+                "answer": "The answer here",
+                "type": "short_answer" OR "true_false"
+            }}
+        ]
+    }}
 
+{chunks_text}
+    """
+
+
+# --- Functions for PDF or Word ---
+def qa_chunk_locations(file_path):
+    """(location, text) for every chunk of a PDF / Word file; PDF locations are 1-based page numbers."""
+    if not file_path.endswith((".pdf", ".docx")):
+        raise ValueError("Unsupported file type. Use PDF or DOCX.")
+    return get_session(file_path).chunk_locations()
+
+def _generate_single(api_key, history):
+    def generate(text, location_str):
+        return generate_qa_per_chunk(text, api_key, location=location_str, history=history)
+    return generate
+
+def _generate_all(tasks, api_key, history=None, max_concurrency=None, progress=None):
+    # Several chunks per prompt, sent concurrently; results come back in chunk order
     all_qas = []
-    for i, chunk in enumerate(chunks):
-        text = chunk['text']
-        location_str = f"Chunk {i+1}"
-        
-        qa_list = generate_qa_per_chunk(text, api_key, location=location_str, history=history)
+    for qa_list in generate_batched(tasks, build_qa_batch_prompt, _generate_single(api_key, history), api_key,
+                                    max_concurrency=max_concurrency, progress=progress):
         if qa_list:
             all_qas.extend(qa_list)
-
     return all_qas
 
-
 # --------- The Full Pipeline ---------
-def qa_pipeline(filepath, api_key, history=None):
-  if filepath.endswith(".pdf"):
-    return pdf_to_qa(filepath, api_key, history=history)
-  elif filepath.endswith(".docx"):
-    return word_to_qa(filepath, api_key, history=history)
\ No newline at end of file
+def qa_pipeline(filepath, api_key, history=None, progress=None):
+  return _generate_all(qa_chunk_locations(filepath), api_key, history, progress=progress)
+
+def iter_qa_pipeline(filepath, api_key, history=None, max_concurrency=None):
+  """
+  Generator version of qa_pipeline: yields one dict per chunk as soon as its questions are parsed
+  ({"chunk", "total", "location", "items"}), in completion order.
+  """
+  tasks = qa_chunk_locations(filepath)
+
+  for i, qa_list in iter_batched(tasks, build_qa_batch_prompt, _generate_single(api_key, history), api_key,
+                                 max_concurrency=max_concurrency):
+    yield {"chunk": i, "total": len(tasks), "location": tasks[i][0], "items": qa_list or []}
@@ -1,53 +1,17 @@
-import json
-from pathlib import Path
-from utils.chunking import adaptive_chunk_markdown
-from utils.hybird_search import hybrid_search, build_faiss_index, build_bm25_index
-from utils.markdown_conversion import convert_to_markdown
-from utils.embeddings import add_embeddings_to_chunks
-from model_init.model import query_model
+from utils.hybird_search import hybrid_search
+from src.document_session import get_session
+from model_init.model import query_model, stream_model
 
-def run_rag_pipeline(
-    file_path: str,
-    query: str,
-    output_folder: str = None,
-    top_k: int = 5,
-    alpha: float = 0.5,
-    api_key: str = None,
-    history: list = None
-):
+def load_document_index(file_path, output_folder=None):
+    """
+    Chunks and search indexes for one document: (chunks, faiss_index, bm25, tokenized_texts).
+    Everything comes from the document's shared session, so other tools reuse the same work.
+    """
+    session = get_session(file_path, output_folder)
+    return (session.chunks, *session.indexes)
 
-    file_path = Path(file_path)
-    if output_folder is None:
-        output_folder = Path(__file__).parent.parent / "processed"
-    else:
-        output_folder = Path(output_folder)
-    output_folder.mkdir(exist_ok=True)
-
-    # Cache file path
-    cache_file = output_folder / f"{file_path.stem}_chunks.json"
-
-    if cache_file.exists():
-        print(f"Loading chunks from cache: {cache_file}")
-        with open(cache_file, "r", encoding="utf-8") as f:
-            chunks = json.load(f)
-    else:
-        print(f"Processing file: {file_path}")
-        md_file = convert_to_markdown(file_path, output_folder)
-        chunks = adaptive_chunk_markdown(md_file)
-        chunks = add_embeddings_to_chunks(chunks)
-        
-        # Save to cache
-        with open(cache_file, "w", encoding="utf-8") as f:
-            json.dump(chunks, f, ensure_ascii=False, indent=2)
-        print(f"Saved chunks to cache: {cache_file}")
-
-    faiss_index = build_faiss_index(chunks)
-    bm25, tokenized_texts = build_bm25_index(chunks)
-
-    best_chunks = hybrid_search(query, chunks, bm25, tokenized_texts, faiss_index, top_k=top_k, alpha=alpha)
 
-    context_text = "\n\n".join([c["text"] for c in best_chunks])
-    
+def format_rag_prompt(context_text, query, history=None):
     # Format history
     history_text = ""
     if history:
@@ -77,8 +41,66 @@ Answer (clean and well-formatted in Markdown):
 - If the context does not contain enough information, say: **"Not enough information to answer."**
 
 """
+    return full_prompt
+
+
+def build_rag_prompt(
+    file_path: str,
+    query: str,
+    output_folder: str = None,
+    top_k: int = 5,
+    alpha: float = 0.5,
+    history: list = None,
+    ef_search: int = None,
+    nprobe: int = None
+):
+    """
+    Retrieval half of the RAG pipeline: returns (prompt, best_chunks) without calling the LLM.
+    """
+    chunks, faiss_index, bm25, tokenized_texts = load_document_index(file_path, output_folder)
+
+    best_chunks = hybrid_search(query, chunks, bm25, tokenized_texts, faiss_index, top_k=top_k, alpha=alpha, ef_search=ef_search, nprobe=nprobe)
+
+    context_text = "\n\n".join([c["text"] for c in best_chunks])
 
+    return format_rag_prompt(context_text, query, history), best_chunks
+
+
+def run_rag_pipeline(
+    file_path: str,
+    query: str,
+    output_folder: str = None,
+    top_k: int = 5,
+    alpha: float = 0.5,
+    api_key: str = None,
+    history: list = None,
+    ef_search: int = None,
+    nprobe: int = None
+):
+    full_prompt, best_chunks = build_rag_prompt(file_path, query, output_folder, top_k, alpha, history, ef_search, nprobe)
 
     answer = query_model(full_prompt, api_key=api_key)
 
     return answer, best_chunks
+
+
+def stream_rag_pipeline(
+    file_path: str,
+    query: str,
+    output_folder: str = None,
+    top_k: int = 5,
+    alpha: float = 0.5,
+    api_key: str = None,
+    history: list = None,
+    ef_search: int = None,
+    nprobe: int = None
+):
+    """
+    Streaming variant of run_rag_pipeline.
+    Yields ("sources", best_chunks) as soon as retrieval is done, then ("token", text) per model delta.
+    """
+    full_prompt, best_chunks = build_rag_prompt(file_path, query, output_folder, top_k, alpha, history, ef_search, nprobe)
+    yield "sources", best_chunks
+
+    for text in stream_model(full_prompt, api_key=api_key):
+        yield "token", text
@@ -1,42 +1,19 @@
 
+import time
 from pathlib import Path
-import json
-from utils.chunking import adaptive_chunk_markdown
-from utils.embeddings import add_embeddings_to_chunks
-from utils.markdown_conversion import convert_to_markdown
-from model_init.model import query_model
+from src.document_session import get_session
+from utils.artifact_cache import get_artifact_cache
+from utils.file_hash import atomic_write_bytes
+from model_init.model import query_model, is_error_response
+from utils.llm_executor import map_concurrently
+from utils.summary_planner import plan_sections, pack_texts, PACK_SEPARATOR
 
 # Process File into Chunks
 def process_file_to_chunks(file_path, output_folder=None):
-    file_path = Path(file_path)
-    if output_folder is None:
-        output_folder = Path(__file__).parent.parent / "processed"
-    else:
-        output_folder = Path(output_folder)
-    output_folder.mkdir(exist_ok=True)
+    return get_session(file_path, output_folder).chunks
 
-    cache_file = output_folder / f"{file_path.stem}_chunks.json"
-
-    if cache_file.exists():
-        with open(cache_file, "r", encoding="utf-8") as f:
-            chunks = json.load(f)
-    else:
-        md_file = convert_to_markdown(file_path, output_folder)
-        chunks = adaptive_chunk_markdown(md_file)
-        chunks = add_embeddings_to_chunks(chunks)
-        with open(cache_file, "w", encoding="utf-8") as f:
-            json.dump(chunks, f, ensure_ascii=False, indent=2)
-    return chunks
-
-# Summarize Each Chunk
-def summarize_chunks(chunks, api_key):
-    summaries = []
-    for i, chunk in enumerate(chunks, 1):
-        text = chunk["text"]
-        location_str = chunk.get("location", "Unknown")
-        header = chunk["metadata"].get("header", f"Section {i}")
-        
-        prompt = f"""
+# Summarize Each Section
+SUMMARY_PROMPT = """
 You are a professional summarizer.
 Create a **concise but informative summary** of the text below.
 - Keep all key concepts and important examples.
@@ -45,22 +22,100 @@ Create a **concise but informative summary** of the text below.
 - Highlight important notes or examples with *italics* or **bold**.
 - Avoid over-summarizing; the summary should still convey the full meaning.
 -Do not make it vary long 
-Text to summarize: {location_str}
+Text to summarize: {location}
 
 Text:
 \"\"\"{text}\"\"\"
 """
+
+REDUCE_PROMPT = """
+You are a professional summarizer.
+The notes below are partial summaries of consecutive parts of the same section: {location}
+Merge them into **one concise but informative summary** of the whole section.
+- Keep all key concepts and important examples.
+- Remove points that are repeated across the partial summaries.
+- Keep sentences short and easy to read.
+- Highlight important notes or examples with *italics* or **bold**.
+- Do not mention that the input was split into parts.
+
+Partial summaries:
+\"\"\"{text}\"\"\"
+"""
+
+# Extra attempts for a prompt whose reply is an error string
+SUMMARY_RETRIES = 1
+
+# Placed in a section whose summary failed; summaries containing it are not cached
+SECTION_ERROR = "*Error generating summary for this section.*"
+
+def query_summary(prompt, api_key):
+    """query_model, retrying error replies; raises RuntimeError if every attempt fails."""
+    for attempt in range(SUMMARY_RETRIES + 1):
+        response = query_model(prompt, api_key=api_key)
+        if not is_error_response(response):
+            return response.strip()
+        print(f"Summary request failed (attempt {attempt + 1}): {response}")
+    raise RuntimeError(response)
+
+def reduce_summaries(summaries, location, api_key, token_budget=None):
+    """
+    Combine partial summaries of one section into one. When they do not fit in a single
+    prompt they are reduced in rounds (hierarchically) until one summary is left.
+    """
+    while len(summaries) > 1:
+        packs = pack_texts(summaries, token_budget)
+        if len(packs) == len(summaries):
+            # Every summary fills a prompt on its own; pair them up so each round still shrinks the list
+            packs = [PACK_SEPARATOR.join(summaries[i:i + 2]) for i in range(0, len(summaries), 2)]
+        summaries = [query_summary(REDUCE_PROMPT.format(location=location, text=pack), api_key) for pack in packs]
+    return summaries[0]
+
+def summarize_chunks(chunks, api_key, max_concurrency=None, progress=None, token_budget=None):
+    """
+    Summarize a document section by section.
+    Consecutive chunks under the same header are packed into prompts of up to token_budget
+    tokens (map); sections that need several prompts get their partial summaries merged (reduce).
+    Returns one "### header" block per section.
+    """
+    sections = plan_sections(chunks, token_budget)
+    tasks = [(s, p, pack) for s, section in enumerate(sections) for p, pack in enumerate(section["packs"])]
+    print(f"Summarizing {len(chunks)} chunks in {len(tasks)} prompts ({len(sections)} sections)")
+
+    def summarize(task):
+        s, p, text = task
         try:
-            summary = query_model(prompt, api_key=api_key)
-            summaries.append(f"### {header}\n\n{summary.strip()}")
+            return query_summary(SUMMARY_PROMPT.format(location=sections[s]["header"], text=text), api_key)
         except Exception as e:
-            print(f"Error summarizing chunk {i}: {e}")
-            summaries.append(f"### {header}\n\n*Error generating summary for this section.*")
-            
-    return "\n\n".join(summaries)
+            print(f"Error summarizing section {s + 1} part {p + 1}: {e}")
+            return None
+
+    # Progress counts map prompts, then one step per section merged
+    total = len(tasks) + len(sections)
+    map_progress = (lambda done, _: progress(done, total)) if progress else None
+    reduce_progress = (lambda done, _: progress(len(tasks) + done, total)) if progress else None
+
+    # Packs are sent concurrently; sections stay in document order
+    partials = map_concurrently(summarize, tasks, max_concurrency=max_concurrency, progress=map_progress)
+    by_section = [[] for _ in sections]
+    for (s, _, _), summary in zip(tasks, partials):
+        by_section[s].append(summary)
+
+    def finish(s):
+        header = sections[s]["header"]
+        summaries = by_section[s]
+        if any(summary is None for summary in summaries):
+            return f"### {header}\n\n{SECTION_ERROR}"
+        try:
+            return f"### {header}\n\n{reduce_summaries(summaries, header, api_key, token_budget)}"
+        except Exception as e:
+            print(f"Error merging summaries for section {s + 1}: {e}")
+            return f"### {header}\n\n{SECTION_ERROR}"
+
+    results = map_concurrently(finish, range(len(sections)), max_concurrency=max_concurrency, progress=reduce_progress)
+    return "\n\n".join(results)
 
 # Full Pipeline
-def summarize_pipeline(file_path, api_key, output_folder=None):
+def summarize_pipeline(file_path, api_key, output_folder=None, progress=None):
     file_path = Path(file_path)
     if output_folder is None:
         output_folder = Path(__file__).parent.parent / "processed"
@@ -68,18 +123,28 @@ def summarize_pipeline(file_path, api_key, output_folder=None):
         output_folder = Path(output_folder)
     output_folder.mkdir(exist_ok=True)
     
-    # Cache file for the final summary
-    summary_cache_file = output_folder / f"{file_path.stem}_summary.md"
+    # Cache file for the final summary, keyed by file content like the other artifacts
+    session = get_session(file_path, output_folder)
+    summary_cache_file = session.artifact_path("summary.md")
+    artifacts = get_artifact_cache(output_folder)
     
     if summary_cache_file.exists():
         print(f"Loading summary from cache: {summary_cache_file}")
+        artifacts.touch(summary_cache_file)
         return summary_cache_file.read_text(encoding="utf-8")
         
     chunks = process_file_to_chunks(file_path, output_folder)
-    final_summary = summarize_chunks(chunks, api_key)
+    t0 = time.perf_counter()
+    final_summary = summarize_chunks(chunks, api_key, progress=progress)
     
+    if SECTION_ERROR in final_summary:
+        # Partial result: return it, but try again next time instead of serving it from the cache
+        print(f"Summary of {file_path.name} has failed sections, not caching it")
+        return final_summary
+
     # Save to cache
-    summary_cache_file.write_text(final_summary, encoding="utf-8")
+    atomic_write_bytes(summary_cache_file, final_summary.encode("utf-8"))
+    artifacts.record(summary_cache_file, "summary", session.doc_hash, cost=time.perf_counter() - t0, name=session.name)
     print(f"Saved summary to cache: {summary_cache_file}")
     
     return final_summary
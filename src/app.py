@@ -9,6 +9,7 @@ from Summarize import summarize_pipeline
 from Keyword import keyword_pipeline
 from RAG_System import run_rag_pipeline
 from utils.summary_to_pdf import generate_summary_pdf
+from utils.artifact_cache import get_artifact_cache
 from flask import send_file
 
 app = Flask(__name__)
@@ -149,27 +150,19 @@ def api_keyword():
 
     try:
         keywords_data = keyword_pipeline(filepath, api_key)
-        # Return the AI refined markdown
-        return jsonify({'response': keywords_data.get('ai_refined', '')})
+        # Return the keyword markdown (LLM-refined when VILO_KEYWORD_REFINE=1)
+        return jsonify({'response': keywords_data.get('markdown', '')})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/cleanup', methods=['POST'])
 def cleanup_cache():
-    """Delete all cached files in the processed directory when user logs out"""
+    """Trim the processed directory to its disk budget when a user logs out"""
     try:
         processed_dir = Path(__file__).parent.parent / "processed"
-        
-        if processed_dir.exists():
-            # Delete all files in the processed directory
-            for item in processed_dir.iterdir():
-                if item.is_file():
-                    item.unlink()
-                    print(f"Deleted cache file: {item}")
-            
-            return jsonify({'status': 'success', 'message': 'Cache cleared successfully'})
-        else:
-            return jsonify({'status': 'success', 'message': 'No cache to clear'})
+        # Cached artifacts are shared by every user; evict least valuable ones instead of wiping them
+        removed = get_artifact_cache(processed_dir).evict()
+        return jsonify({'status': 'success', 'message': f'Evicted {len(removed)} cached artifacts'})
     except Exception as e:
         print(f"Error cleaning cache: {e}")
         return jsonify({'error': str(e)}), 500
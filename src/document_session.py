@@ -0,0 +1,231 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from utils.file_hash import file_content_hash
+from utils.markdown_conversion import convert_to_markdown, PAGE_BREAK
+from utils.chunking import adaptive_chunk_markdown
+from utils.embeddings import add_embeddings_to_chunks
+from utils.chunk_store import chunk_store_exists, load_chunks, load_embeddings, save_chunk_store, migrate_legacy_json
+from utils.index_store import load_or_build_indexes, forget_indexes
+from utils.artifact_cache import document_dir, get_artifact_cache
+from utils.single_flight import single_flight
+
+# Sessions kept in memory; each holds chunk records, the index handles live in utils.index_store
+MAX_SESSIONS = int(os.environ.get("VILO_MAX_SESSIONS", "8"))
+
+DEFAULT_OUTPUT_FOLDER = Path(__file__).parent.parent / "processed"
+
+# Page markers are inserted between pages before chunking and removed from the chunk text afterwards
+PAGE_MARKER = re.compile(r"\[PAGE:(\d+)\]")
+_PAGE_MARKER_LINE = re.compile(r"[ \t]*\[PAGE:\d+\][ \t]*\n?")
+_EXTRA_NEWLINES = re.compile(r"\n{3,}")
+# End of a marker cut in half where the chunk overlap starts, e.g. "AGE:3]" or "2]" at the start of a chunk
+_PARTIAL_PAGE_MARKER = re.compile(r"^(?:(?:(?:(?:(?:\[?P)?A)?G)?E)?:)?\d*\][ \t]*\n?")
+
+
+def annotate_pages(markdown):
+    """
+    Replace Docling page-break placeholders with [PAGE:n] marker paragraphs (1-based).
+    Returns (text, page_count); page_count is 0 when the markdown carries no page breaks (e.g. DOCX).
+    """
+    pages = markdown.split(PAGE_BREAK)
+    if len(pages) == 1:
+        return markdown, 0
+    return "\n\n".join(f"[PAGE:{n}]\n\n{page}" for n, page in enumerate(pages, 1)), len(pages)
+
+
+def assign_pages(chunks):
+    """
+    Move page markers out of the chunk text into metadata ("pages", "page_number").
+    A chunk is on the page of the last marker before it plus any page whose marker it contains.
+    """
+    result = []
+    current_page = 1
+    for chunk in chunks:
+        text = chunk["text"]
+        found = [int(n) for n in PAGE_MARKER.findall(text)]
+        pages = set(found)
+        if not PAGE_MARKER.match(text):
+            pages.add(current_page)
+        if found:
+            current_page = max(current_page, max(found))
+
+        text = _PARTIAL_PAGE_MARKER.sub("", text.lstrip())
+        text = _EXTRA_NEWLINES.sub("\n\n", _PAGE_MARKER_LINE.sub("", text)).strip()
+        if not text:
+            continue
+        pages = sorted(pages)
+        metadata = {**chunk["metadata"], "size": len(text), "pages": pages, "page_number": pages[0]}
+        result.append({"text": text, "metadata": metadata})
+    return result
+
+
+class DocumentSession:
+    """
+    Everything derived from one uploaded file: markdown, page map, chunks, embeddings and
+    search indexes. Each artifact is built on first use, cached on disk by file content,
+    and shared by every pipeline that opens the same document.
+    """
+
+    def __init__(self, file_path, output_folder=None):
+        self.file_path = Path(file_path)
+        self.output_folder = Path(output_folder) if output_folder is not None else DEFAULT_OUTPUT_FOLDER
+        self.output_folder.mkdir(exist_ok=True)
+        self.doc_hash = file_content_hash(self.file_path)
+        self.store_base = self.artifact_path("chunks")
+        self._lock = threading.RLock()
+        self._markdown_path = None
+        self._page_count = None
+        self._chunks = None
+
+    @property
+    def name(self):
+        return self.file_path.name
+
+    def artifact_path(self, name):
+        """Path of a cached artifact of this document, e.g. "summary.md"."""
+        return document_dir(self.output_folder, self.doc_hash) / name
+
+    @property
+    def markdown_path(self):
+        with self._lock:
+            # Re-resolved when the artifact cache has evicted the file since
+            if self._markdown_path is None or not self._markdown_path.exists():
+                self._markdown_path = convert_to_markdown(self.file_path, self.output_folder)
+            return self._markdown_path
+
+    @property
+    def markdown(self):
+        """Docling markdown without page-break placeholders."""
+        return self.markdown_path.read_text(encoding="utf-8").replace(PAGE_BREAK, "\n\n")
+
+    @property
+    def page_count(self):
+        """Number of pages, or 0 when the format has no pages (DOCX)."""
+        with self._lock:
+            if self._page_count is None:
+                self._page_count = annotate_pages(self.markdown_path.read_text(encoding="utf-8"))[1]
+            return self._page_count
+
+    @property
+    def chunks(self):
+        """Chunk records ({"text", "metadata"}); PDF chunks carry "pages" and "page_number"."""
+        with self._lock:
+            if self._chunks is None or not chunk_store_exists(self.store_base):
+                self._chunks = self._load_or_build_chunks()
+            return self._chunks
+
+    def _load_or_build_chunks(self):
+        if chunk_store_exists(self.store_base):
+            print(f"Loading chunks from cache: {self.store_base}")
+            get_artifact_cache(self.output_folder).touch(self.store_base)
+            return load_chunks(self.store_base)
+
+        # Same document opened by several requests, sessions or worker processes: build once
+        with single_flight(f"chunks-{self.doc_hash}", self.output_folder / "locks"):
+            if chunk_store_exists(self.store_base):
+                print(f"Loading chunks built by a concurrent request: {self.store_base}")
+                return load_chunks(self.store_base)
+            legacy_path = self._legacy_chunks_path()
+            if legacy_path is not None:
+                try:
+                    return self._migrate_legacy_chunks(legacy_path)
+                except (OSError, ValueError) as e:
+                    print(f"Could not migrate {legacy_path}, rebuilding: {e}")
+            return self._build_chunks()
+
+    def _legacy_chunks_path(self):
+        # The old layout cached chunks as processed/<stem>_chunks.json, keyed by name rather than
+        # content; it is only trusted when written after the current upload of the file
+        path = self.output_folder / f"{self.file_path.stem}_chunks.json"
+        try:
+            if path.stat().st_mtime >= self.file_path.stat().st_mtime:
+                return path
+        except OSError:
+            pass
+        return None
+
+    def _migrate_legacy_chunks(self, legacy_path):
+        self.store_base.parent.mkdir(parents=True, exist_ok=True)
+        chunks = migrate_legacy_json(legacy_path, self.store_base)
+        # Default cost: rebuilding after an eviction means converting and embedding again
+        get_artifact_cache(self.output_folder).record(self.store_base, "chunks", self.doc_hash, name=self.name)
+        print(f"Migrated chunks from {legacy_path} to {self.store_base}")
+        return chunks
+
+    def _build_chunks(self):
+        print(f"Processing file: {self.file_path}")
+        t0 = time.perf_counter()
+        text, page_count = annotate_pages(self.markdown_path.read_text(encoding="utf-8"))
+        self._page_count = page_count
+        chunks = adaptive_chunk_markdown(self.file_path, text=text)
+        if page_count:
+            chunks = assign_pages(chunks)
+        chunks = add_embeddings_to_chunks(chunks)
+
+        self.store_base.parent.mkdir(parents=True, exist_ok=True)
+        chunks = save_chunk_store(chunks, self.store_base)
+        get_artifact_cache(self.output_folder).record(
+            self.store_base, "chunks", self.doc_hash, cost=time.perf_counter() - t0, name=self.name)
+        print(f"Saved chunks to cache: {self.store_base}")
+        return chunks
+
+    @property
+    def embeddings(self):
+        """float32 (num_chunks, dim) matrix, memory-mapped from the chunk store."""
+        self.chunks  # builds the chunk store on first use
+        return load_embeddings(self.store_base)
+
+    @property
+    def indexes(self):
+        """(faiss_index, bm25, tokenized_texts) for hybrid search."""
+        chunks = self.chunks
+        with self._lock:
+            return load_or_build_indexes(chunks, self.doc_hash, self.output_folder, embeddings=lambda: self.embeddings)
+
+    def chunk_locations(self):
+        """(location, text) for every chunk: "Pages 3, 4" when page numbers are known, else "Chunk n"."""
+        locations = []
+        for i, chunk in enumerate(self.chunks):
+            pages = chunk["metadata"].get("pages")
+            location = f"Pages {', '.join(map(str, pages))}" if pages else f"Chunk {i + 1}"
+            locations.append((location, chunk["text"]))
+        return locations
+
+
+_sessions = OrderedDict()
+_sessions_lock = threading.Lock()
+
+
+def get_session(file_path, output_folder=None):
+    """
+    The shared DocumentSession for a file. On-disk artifacts are keyed by file content, so
+    the same bytes uploaded under another name reuse everything already built.
+    """
+    output_folder = Path(output_folder) if output_folder is not None else DEFAULT_OUTPUT_FOLDER
+    key = (str(Path(file_path).resolve()), file_content_hash(file_path), str(output_folder.resolve()))
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = DocumentSession(file_path, output_folder)
+            _sessions[key] = session
+        _sessions.move_to_end(key)
+        while len(_sessions) > MAX_SESSIONS:
+            _sessions.popitem(last=False)
+        return session
+
+
+def invalidate_document(doc_hash, output_folder=None):
+    """
+    Drop everything cached for one document: open sessions, loaded indexes and the files on disk.
+    Returns the number of bytes freed on disk.
+    """
+    output_folder = Path(output_folder) if output_folder is not None else DEFAULT_OUTPUT_FOLDER
+    with _sessions_lock:
+        for key in [key for key in _sessions if key[1] == doc_hash]:
+            del _sessions[key]
+    forget_indexes(doc_hash)
+    return get_artifact_cache(output_folder).invalidate(doc_hash)
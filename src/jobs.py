@@ -0,0 +1,237 @@
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from utils.file_hash import atomic_write_bytes
+
+# Background workers shared by all job types
+JOB_WORKERS = int(os.environ.get("VILO_JOB_WORKERS", "2"))
+JOBS_FOLDER = Path(__file__).parent.parent / "processed" / "jobs"
+# Finished jobs (and their files) are dropped after this many seconds, oldest first beyond MAX_FINISHED_JOBS
+JOB_TTL_SECONDS = float(os.environ.get("VILO_JOB_TTL", "86400"))
+MAX_FINISHED_JOBS = int(os.environ.get("VILO_MAX_FINISHED_JOBS", "500"))
+# Finished jobs are swept at most this often, on job submission
+SWEEP_INTERVAL = 60
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, job_type, params=None):
+        self.id = uuid.uuid4().hex
+        self.type = job_type
+        self.params = params or {}
+        self.status = QUEUED
+        self.progress = {"done": 0, "total": None}
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.result = None
+        self.cancel_event = threading.Event()
+
+    def to_dict(self, include_result=False):
+        data = {
+            "job_id": self.id,
+            "type": self.type,
+            "params": self.params,
+            "status": self.status,
+            "progress": self.progress,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+class JobManager:
+    """
+    Runs long document pipelines on a worker pool.
+
+    Job state is mirrored to <jobs_folder>/<job_id>.json on every change, so status,
+    progress and results can be read (and jobs cancelled) from any worker process.
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, jobs_folder=JOBS_FOLDER):
+        self.jobs_folder = Path(jobs_folder)
+        self.jobs_folder.mkdir(parents=True, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vilo-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+    def _valid_id(self, job_id):
+        return bool(re.fullmatch(r"[0-9a-f]{32}", job_id or ""))
+
+    def _job_file(self, job_id):
+        return self.jobs_folder / f"{job_id}.json"
+
+    def _cancel_file(self, job_id):
+        return self.jobs_folder / f"{job_id}.cancel"
+
+    def _save(self, job):
+        atomic_write_bytes(self._job_file(job.id), json.dumps(job.to_dict(include_result=True), ensure_ascii=False).encode("utf-8"))
+
+    def submit(self, job_type, fn, params=None, *args, **kwargs):
+        """
+        Queue fn(*args, progress=callback, **kwargs). The callback records per-chunk
+        progress and raises JobCancelled once the job has been cancelled.
+        """
+        self._maybe_sweep()
+        job = Job(job_type, params)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._save(job)
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _is_cancelled(self, job):
+        return job.cancel_event.is_set() or self._cancel_file(job.id).exists()
+
+    def _run(self, job, fn, args, kwargs):
+        if self._is_cancelled(job):
+            self._finish(job, CANCELLED)
+            return
+
+        job.status = RUNNING
+        job.started_at = time.time()
+        self._save(job)
+
+        def progress(done, total):
+            job.progress = {"done": done, "total": total}
+            self._save(job)
+            if self._is_cancelled(job):
+                raise JobCancelled()
+
+        try:
+            result = fn(*args, progress=progress, **kwargs)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+            return
+        except Exception as e:
+            # A pipeline that turned the cancellation into its own error was still cancelled
+            if self._is_cancelled(job):
+                self._finish(job, CANCELLED)
+                return
+            print(f"Error in job {job.id} ({job.type}): {e}")
+            self._finish(job, FAILED, error=str(e))
+            return
+
+        if self._is_cancelled(job):
+            self._finish(job, CANCELLED)
+        else:
+            self._finish(job, SUCCEEDED, result=result)
+
+    def _finish(self, job, status, result=None, error=None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+        self._save(job)
+        self._cancel_file(job.id).unlink(missing_ok=True)
+
+    def _delete_files(self, job_id):
+        self._job_file(job_id).unlink(missing_ok=True)
+        self._cancel_file(job_id).unlink(missing_ok=True)
+
+    def _maybe_sweep(self):
+        now = time.time()
+        with self._lock:
+            if now - self._last_sweep < SWEEP_INTERVAL:
+                return
+            self._last_sweep = now
+        self.sweep()
+
+    def sweep(self, now=None):
+        """
+        Forget finished jobs older than JOB_TTL_SECONDS, and the oldest ones beyond
+        MAX_FINISHED_JOBS, deleting their files. Files left by other worker processes are
+        swept by age as well. Returns the number of jobs removed.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            finished = sorted(
+                (job for job in self._jobs.values() if job.status in FINISHED_STATES),
+                key=lambda job: job.finished_at)
+            expired = [job for job in finished if now - job.finished_at > JOB_TTL_SECONDS]
+            keep = finished[len(expired):]
+            if MAX_FINISHED_JOBS >= 0 and len(keep) > MAX_FINISHED_JOBS:
+                expired += keep[:len(keep) - MAX_FINISHED_JOBS]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            self._delete_files(job.id)
+        removed = len(expired)
+
+        # Jobs of other processes (or of an earlier run): only files untouched for the TTL are read
+        for job_file in self.jobs_folder.glob("*.json"):
+            try:
+                if now - job_file.stat().st_mtime <= JOB_TTL_SECONDS:
+                    continue
+                with open(job_file, "r", encoding="utf-8") as f:
+                    status = json.load(f).get("status")
+            except (OSError, ValueError):
+                continue
+            if status in FINISHED_STATES:
+                self._delete_files(job_file.stem)
+                removed += 1
+        return removed
+
+    def get(self, job_id, include_result=False):
+        """
+        Job state as a dict, from memory if this process runs the job, else from disk.
+        Returns None for unknown ids.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict(include_result=include_result)
+
+        if not self._valid_id(job_id):
+            return None
+        job_file = self._job_file(job_id)
+        if not job_file.exists():
+            return None
+        with open(job_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not include_result:
+            data.pop("result", None)
+        return data
+
+    def cancel(self, job_id):
+        """
+        Request cancellation. Running jobs stop at the next chunk boundary.
+        Returns the job state, or None for unknown ids.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            if job.status not in FINISHED_STATES:
+                job.cancel_event.set()
+            return job.to_dict()
+
+        data = self.get(job_id)
+        if data is not None and data["status"] not in FINISHED_STATES:
+            # Owned by another worker process: it picks the marker up on its next progress update
+            self._cancel_file(job_id).touch()
+        return data
+
+    def list(self):
+        with self._lock:
+            return [job.to_dict() for job in self._jobs.values()]
@@ -1,15 +1,30 @@
 import os
+import re
 import json
-from flask import Flask, request, jsonify, session
+from flask import Flask, request, jsonify, session, Response
 from werkzeug.utils import secure_filename
-from src.QA import qa_pipeline
-from src.Summarize import summarize_pipeline
-from src.Keyword import keyword_pipeline
-from src.Flashcard import flashcard_pipeline
-from src.RAG_System import run_rag_pipeline
-from utils.summary_to_pdf import generate_summary_pdf
+from utils import startup
+from src.jobs import JobManager, SUCCEEDED
 from flask import send_file
 
+# Pipelines pull in docling, torch, faiss and sentence-transformers; import them on first use
+# so the service (and /api/health) is up before any of those are loaded.
+PIPELINE_MODULES = ["src.QA", "src.Summarize", "src.Keyword", "src.Flashcard", "src.RAG_System", "src.Library", "utils.summary_to_pdf"]
+qa_pipeline = startup.deferred("src.QA", "qa_pipeline")
+summarize_pipeline = startup.deferred("src.Summarize", "summarize_pipeline")
+keyword_pipeline = startup.deferred("src.Keyword", "keyword_pipeline")
+flashcard_pipeline = startup.deferred("src.Flashcard", "flashcard_pipeline")
+iter_qa_pipeline = startup.deferred("src.QA", "iter_qa_pipeline")
+iter_flashcard_pipeline = startup.deferred("src.Flashcard", "iter_flashcard_pipeline")
+run_rag_pipeline = startup.deferred("src.RAG_System", "run_rag_pipeline")
+stream_rag_pipeline = startup.deferred("src.RAG_System", "stream_rag_pipeline")
+run_library_pipeline = startup.deferred("src.Library", "run_library_pipeline")
+stream_library_pipeline = startup.deferred("src.Library", "stream_library_pipeline")
+list_library = startup.deferred("src.Library", "list_library")
+generate_summary_pdf = startup.deferred("utils.summary_to_pdf", "generate_summary_pdf")
+get_session = startup.deferred("src.document_session", "get_session")
+invalidate_document = startup.deferred("src.document_session", "invalidate_document")
+
 app = Flask(__name__)
 app.secret_key = 'supersecretkey'  # Change this in production
 
@@ -24,10 +39,89 @@ def get_api_key():
     data = request.get_json(silent=True) or {}
     return data.get('api_key')
 
+def parse_bool(value):
+    """JSON booleans, 0/1 and "true"/"false"-style strings; None stays None. Raises ValueError otherwise."""
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in ('1', 'true', 'yes', 'on'):
+        return True
+    if isinstance(value, str) and value.strip().lower() in ('0', 'false', 'no', 'off', ''):
+        return False
+    raise ValueError(f"Not a boolean: {value!r}")
+
+def parse_positive_int(value, default=None):
+    """A positive integer request field (JSON number or numeric string); missing -> default. Raises ValueError otherwise."""
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        raise ValueError(f"Not a positive integer: {value!r}")
+    number = int(value)
+    if number != float(value) or number < 1:
+        raise ValueError(f"Not a positive integer: {value!r}")
+    return number
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'ok', 'service': 'ml_service'})
 
+@app.route('/api/startup', methods=['GET'])
+def startup_info():
+    # Cold-start timings: when the app became ready and what each deferred import cost
+    return jsonify(startup.startup_report())
+
+@app.route('/api/stats/converters', methods=['GET'])
+def converter_stats():
+    stats = startup.import_deferred("utils.markdown_conversion").converter_pool_stats()
+    # How often requests waited for another request's conversion / chunking / indexing of the same file
+    stats['single_flight'] = startup.import_deferred("utils.single_flight").single_flight_stats()
+    return jsonify(stats)
+
+@app.route('/api/stats/llm', methods=['GET'])
+def llm_stats():
+    cache = startup.import_deferred("model_init.response_cache").get_response_cache()
+    return jsonify({
+        'clients': startup.import_deferred("model_init.model").client_pool_stats(),
+        'response_cache': cache.stats() if cache is not None else {'enabled': False},
+    })
+
+def artifact_cache():
+    document_session = startup.import_deferred("src.document_session")
+    return startup.import_deferred("utils.artifact_cache").get_artifact_cache(document_session.DEFAULT_OUTPUT_FOLDER)
+
+@app.route('/api/cache', methods=['GET'])
+def cache_stats():
+    # Cached document artifacts (markdown, chunks, indexes, summaries) by kind and by document
+    return jsonify(artifact_cache().stats())
+
+@app.route('/api/cache/<doc_hash>', methods=['DELETE'])
+def cache_invalidate(doc_hash):
+    if not re.fullmatch(r'[0-9a-f]{64}', doc_hash):
+        return jsonify({'error': 'Invalid document hash'}), 400
+    return jsonify({'doc_hash': doc_hash, 'freed_bytes': invalidate_document(doc_hash)})
+
+@app.route('/api/cache/invalidate', methods=['POST'])
+def cache_invalidate_file():
+    data = request.json or {}
+    filename = data.get('filename')
+    if not filename:
+        return jsonify({'error': 'No filename provided'}), 400
+
+    # Only files in the upload folder can be named
+    filepath = os.path.join(UPLOAD_FOLDER, os.path.basename(filename))
+    if not os.path.isfile(filepath):
+        return jsonify({'error': 'File not found'}), 404
+
+    doc_hash = get_session(filepath).doc_hash
+    return jsonify({'doc_hash': doc_hash, 'freed_bytes': invalidate_document(doc_hash)})
+
+@app.route('/api/cleanup', methods=['POST'])
+def cleanup_cache():
+    # Called on logout. The cache is shared by all users, so only trim it to its disk budget
+    removed = artifact_cache().evict()
+    return jsonify({'status': 'success', 'evicted': len(removed)})
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     data = request.json
@@ -49,23 +143,127 @@ def chat():
     elif message.strip().startswith('/keyword'):
         return api_keyword_internal(filepath, api_key)
     
+    # Optional ANN tuning for large documents (HNSW efSearch / IVF nprobe)
+    try:
+        search_options = {'ef_search': parse_positive_int(data.get('ef_search')),
+                          'nprobe': parse_positive_int(data.get('nprobe'))}
+    except (TypeError, ValueError):
+        return jsonify({'error': 'ef_search and nprobe must be positive integers'}), 400
+    try:
+        stream = parse_bool(data.get('stream'))
+    except ValueError:
+        return jsonify({'error': 'stream must be a boolean'}), 400
+
+    if stream:
+        return chat_stream_internal(filepath, message, api_key, history, search_options)
+
     # RAG Chat
     try:
-        answer, best_chunks = run_rag_pipeline(filepath, message, api_key=api_key, history=history)
-        
-        # Format sources
-        sources = []
-        for chunk in best_chunks:
-            sources.append({
-                'text': chunk['text'][:200] + "...",
-                'page': chunk.get('metadata', {}).get('page_number', 'Unknown')
-            })
-            
-        return jsonify({'response': answer, 'sources': sources})
+        answer, best_chunks = run_rag_pipeline(filepath, message, api_key=api_key, history=history, **search_options)
+        return jsonify({'response': answer, 'sources': format_sources(best_chunks)})
     except Exception as e:
         print(f"Error in chat: {e}")
         return jsonify({'error': str(e)}), 500
 
+def format_sources(best_chunks):
+    sources = []
+    for chunk in best_chunks:
+        metadata = chunk.get('metadata', {})
+        source = {
+            'text': chunk['text'][:200] + "...",
+            'page': metadata.get('page_number', 'Unknown'),
+            'header': metadata.get('header', 'Root')
+        }
+        # Library search results also say which document they came from
+        if 'document' in metadata:
+            source['document'] = metadata['document']
+            source['score'] = metadata.get('score')
+        sources.append(source)
+    return sources
+
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+def chat_stream_internal(filepath, message, api_key, history, search_options=None):
+    return sse_chat_response(
+        lambda: stream_rag_pipeline(filepath, message, api_key=api_key, history=history, **(search_options or {})))
+
+def sse_chat_response(make_events):
+    """
+    Server-Sent Events: one `sources` event once retrieval is done, `token` events
+    as the answer is generated, then `done` (or `error`).
+    """
+    def generate():
+        try:
+            for kind, value in make_events():
+                if kind == "sources":
+                    yield sse_event('sources', {'sources': format_sources(value)})
+                else:
+                    yield sse_event('token', {'text': value})
+            yield sse_event('done', {})
+        except Exception as e:
+            print(f"Error in chat stream: {e}")
+            yield sse_event('error', {'error': str(e)})
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+@app.route('/api/library', methods=['GET'])
+def library():
+    return jsonify({'documents': list_library(UPLOAD_FOLDER)})
+
+@app.route('/api/library/chat', methods=['POST'])
+def library_chat():
+    """
+    Ask one question across several uploaded documents.
+    `filenames` restricts the search to those documents; by default every uploaded document is searched.
+    """
+    data = request.json or {}
+    message = data.get('message', '')
+    history = data.get('history', [])
+    api_key = data.get('api_key')
+    filenames = data.get('filenames') or list_library(UPLOAD_FOLDER)
+
+    if not message.strip():
+        return jsonify({'error': 'No message provided'}), 400
+    if not isinstance(filenames, list) or not all(isinstance(f, str) and f.strip() for f in filenames):
+        return jsonify({'error': 'filenames must be a list of file names'}), 400
+
+    filepaths = []
+    for filename in filenames:
+        filepath = os.path.join(UPLOAD_FOLDER, os.path.basename(filename))
+        if not os.path.isfile(filepath):
+            return jsonify({'error': f'File not found: {filename}'}), 404
+        filepaths.append(filepath)
+    if not filepaths:
+        return jsonify({'error': 'No documents in the library'}), 404
+
+    try:
+        options = {
+            'top_k': parse_positive_int(data.get('top_k'), 5),
+            'ef_search': parse_positive_int(data.get('ef_search')),
+            'nprobe': parse_positive_int(data.get('nprobe')),
+        }
+    except (TypeError, ValueError):
+        return jsonify({'error': 'top_k, ef_search and nprobe must be positive integers'}), 400
+    try:
+        stream = parse_bool(data.get('stream'))
+    except ValueError:
+        return jsonify({'error': 'stream must be a boolean'}), 400
+
+    if stream:
+        return sse_chat_response(
+            lambda: stream_library_pipeline(filepaths, message, api_key=api_key, history=history, **options))
+
+    try:
+        answer, best_chunks = run_library_pipeline(filepaths, message, api_key=api_key, history=history, **options)
+        return jsonify({'response': answer, 'sources': format_sources(best_chunks)})
+    except Exception as e:
+        print(f"Error in library chat: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/questions', methods=['POST'])
 def api_questions():
     data = request.json or {}
@@ -87,6 +285,43 @@ def api_questions():
         print(f"Error in questions: {e}")
         return jsonify({'error': str(e)}), 500
 
+def ndjson_response(chunk_results):
+    """
+    Stream one JSON line per finished chunk ({"type": "chunk", ...}), then {"type": "done"}
+    or {"type": "error"}. Nothing is accumulated server-side.
+    """
+    def generate():
+        items = 0
+        try:
+            for chunk_result in chunk_results:
+                items += len(chunk_result["items"])
+                yield json.dumps({'type': 'chunk', **chunk_result}, ensure_ascii=False) + "\n"
+            yield json.dumps({'type': 'done', 'items': items}) + "\n"
+        except Exception as e:
+            print(f"Error in stream: {e}")
+            yield json.dumps({'type': 'error', 'error': str(e)}) + "\n"
+
+    return Response(generate(), mimetype='application/x-ndjson', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+@app.route('/api/questions/stream', methods=['POST'])
+def api_questions_stream():
+    data = request.json or {}
+    history = data.get('history', [])
+    filename = data.get('filename')
+    api_key = data.get('api_key')
+
+    if not filename:
+        return jsonify({'error': 'No filename provided'}), 400
+
+    filepath = os.path.join(UPLOAD_FOLDER, filename)
+    if not os.path.exists(filepath):
+        return jsonify({'error': 'File not found'}), 404
+
+    return ndjson_response(iter_qa_pipeline(filepath, api_key, history=history))
+
 def api_summarize_internal(filepath, api_key):
     try:
         summary = summarize_pipeline(filepath, api_key)
@@ -110,10 +345,10 @@ def api_summarize():
 
     return api_summarize_internal(filepath, api_key)
 
-def api_keyword_internal(filepath, api_key):
+def api_keyword_internal(filepath, api_key, refine=None):
     try:
-        keywords_data = keyword_pipeline(filepath, api_key)
-        return jsonify({'response': keywords_data.get('ai_refined', '')})
+        keywords_data = keyword_pipeline(filepath, api_key, refine=refine)
+        return jsonify({'response': keywords_data.get('markdown', '')})
     except Exception as e:
         print(f"Error in keyword: {e}")
         return jsonify({'error': str(e)}), 500
@@ -131,7 +366,12 @@ def api_keyword():
     if not os.path.exists(filepath):
         return jsonify({'error': 'File not found'}), 404
 
-    return api_keyword_internal(filepath, api_key)
+    # refine: also pass the locally ranked keywords through the LLM (default: VILO_KEYWORD_REFINE)
+    try:
+        refine = parse_bool(data.get('refine'))
+    except ValueError:
+        return jsonify({'error': 'refine must be a boolean'}), 400
+    return api_keyword_internal(filepath, api_key, refine=refine)
 
 @app.route('/api/flashcards', methods=['POST'])
 def api_flashcards():
@@ -154,6 +394,117 @@ def api_flashcards():
         print(f"Error in flashcards: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/flashcards/stream', methods=['POST'])
+def api_flashcards_stream():
+    data = request.json or {}
+    history = data.get('history', [])
+    filename = data.get('filename')
+    api_key = data.get('api_key')
+
+    if not filename:
+        return jsonify({'error': 'No filename provided'}), 400
+
+    filepath = os.path.join(UPLOAD_FOLDER, filename)
+    if not os.path.exists(filepath):
+        return jsonify({'error': 'File not found'}), 404
+
+    return ndjson_response(iter_flashcard_pipeline(filepath, api_key, history=history))
+
+# --- Background jobs ---
+
+job_manager = JobManager()
+
+def build_summary_pdf(filepath, api_key, progress=None):
+    """
+    Render the summary PDF into the document's cache directory (keyed by content, so uploads
+    sharing a name don't overwrite each other). Returns its path, or None on failure.
+    """
+    session = get_session(filepath)
+    pdf_filepath = session.artifact_path("summary.pdf")
+    if not generate_summary_pdf(filepath, api_key, str(pdf_filepath), progress=progress) or not pdf_filepath.exists():
+        return None
+    artifact_cache().record(pdf_filepath, "summary_pdf", session.doc_hash, name=session.name)
+    return pdf_filepath
+
+def summary_pdf_job(filepath, api_key, progress=None):
+    filename = os.path.basename(filepath)
+    pdf_filepath = build_summary_pdf(filepath, api_key, progress=progress)
+    if pdf_filepath is None:
+        raise RuntimeError('Failed to generate PDF')
+    return {'pdf_filename': f"{os.path.splitext(filename)[0]}_summary.pdf", 'pdf_path': str(pdf_filepath)}
+
+# job type -> fn(filepath, api_key, history, progress) returning the same body as the blocking endpoint
+JOB_TYPES = {
+    'summarize': lambda filepath, api_key, history, options, progress: {
+        'response': summarize_pipeline(filepath, api_key, progress=progress)},
+    'questions': lambda filepath, api_key, history, options, progress: {
+        'result': qa_pipeline(filepath, api_key, history=history, progress=progress)},
+    'flashcards': lambda filepath, api_key, history, options, progress: {
+        'result': flashcard_pipeline(filepath, api_key, history=history, progress=progress)},
+    'keyword': lambda filepath, api_key, history, options, progress: {
+        'response': keyword_pipeline(filepath, api_key, progress=progress, refine=options.get('refine')).get('markdown', '')},
+    'summary_pdf': lambda filepath, api_key, history, options, progress: summary_pdf_job(filepath, api_key, progress=progress),
+}
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    data = request.json or {}
+    job_type = data.get('type')
+    filename = data.get('filename')
+    api_key = data.get('api_key')
+    history = data.get('history', [])
+
+    if job_type not in JOB_TYPES:
+        return jsonify({'error': f"Unknown job type. Use one of: {', '.join(JOB_TYPES)}"}), 400
+    try:
+        options = {'refine': parse_bool(data.get('refine'))}
+    except ValueError:
+        return jsonify({'error': 'refine must be a boolean'}), 400
+    if not filename:
+        return jsonify({'error': 'No filename provided'}), 400
+
+    filepath = os.path.join(UPLOAD_FOLDER, filename)
+    if not os.path.exists(filepath):
+        return jsonify({'error': 'File not found'}), 404
+
+    job = job_manager.submit(job_type, JOB_TYPES[job_type], {'filename': filename}, filepath, api_key, history, options)
+    return jsonify({'job_id': job.id, 'status': job.status}), 202
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify({'jobs': job_manager.list()})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = job_manager.get(job_id, include_result=True)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] != SUCCEEDED:
+        return jsonify({'error': f"Job is {job['status']}", 'status': job['status'], 'job_error': job['error']}), 409
+
+    result = job['result']
+    if job['type'] == 'summary_pdf':
+        # The PDF lives in the document's artifact directory and may have been evicted since
+        pdf_filepath = result.get('pdf_path')
+        if not pdf_filepath or not os.path.isfile(pdf_filepath):
+            return jsonify({'error': 'File not found'}), 404
+        return send_file(pdf_filepath, as_attachment=True, download_name=result['pdf_filename'])
+    return jsonify(result)
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
 @app.route('/api/download_summary_pdf', methods=['POST'])
 def download_summary_pdf():
     data = request.json
@@ -167,20 +518,13 @@ def download_summary_pdf():
     if not os.path.exists(filepath):
         return jsonify({'error': 'File not found'}), 404
 
-    # Define output PDF path
-    # We can save it in the uploads folder or a temp folder
     pdf_filename = f"{os.path.splitext(filename)[0]}_summary.pdf"
-    pdf_filepath = os.path.join(UPLOAD_FOLDER, pdf_filename)
 
     try:
-        # Check if PDF already exists to avoid re-generating (optional, but good for cache)
-        # For now, let's regenerate to ensure it's fresh or if user changed settings
-        # Or maybe we should check if it exists and is newer than the source file?
-        # Let's just generate it.
+        # Regenerated on every request; the summary itself comes from the artifact cache
+        pdf_filepath = build_summary_pdf(filepath, api_key)
         
-        success = generate_summary_pdf(filepath, api_key, pdf_filepath)
-        
-        if success and os.path.exists(pdf_filepath):
+        if pdf_filepath is not None:
             return send_file(pdf_filepath, as_attachment=True, download_name=pdf_filename)
         else:
             return jsonify({'error': 'Failed to generate PDF'}), 500
@@ -189,6 +533,23 @@ def download_summary_pdf():
         print(f"Error generating PDF: {e}")
         return jsonify({'error': str(e)}), 500
 
+if startup.STARTUP_MODE == "eager":
+    startup.preload(PIPELINE_MODULES)
+    # Build the Docling converters (and load their models) once per worker
+    startup.import_deferred("utils.markdown_conversion").warm_converter_pool()
+    startup.mark("converters_warm")
+    # Models and word lists the pipelines otherwise load on their first request
+    startup.import_deferred("utils.model_registry").get_embedding_model()
+    startup.mark("embedding_model_loaded")
+    startup.import_deferred("utils.chunking").load_wordsegment()
+    startup.mark("wordsegment_loaded")
+    try:
+        startup.import_deferred("utils.clean_text").get_stop_words()
+        startup.mark("stopwords_loaded")
+    except LookupError as e:
+        print(f"Stopwords not preloaded: {e}")
+startup.mark("app_ready")
+
 if __name__ == '__main__':
     # Run on port 5001
     app.run(debug=True, port=5001)
@@ -0,0 +1,112 @@
+import os
+import math
+import faiss
+import numpy as np
+
+# Index type is picked from the number of vectors:
+#   n < VILO_ANN_HNSW_THRESHOLD          -> IndexFlatIP (exact)
+#   n < VILO_ANN_IVF_THRESHOLD           -> IndexHNSWFlat
+#   otherwise                            -> IndexIVFFlat (trained k-means coarse quantizer)
+HNSW_THRESHOLD = int(os.environ.get("VILO_ANN_HNSW_THRESHOLD", "20000"))
+IVF_THRESHOLD = int(os.environ.get("VILO_ANN_IVF_THRESHOLD", "200000"))
+
+HNSW_M = int(os.environ.get("VILO_ANN_HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.environ.get("VILO_ANN_HNSW_EF_CONSTRUCTION", "200"))
+DEFAULT_EF_SEARCH = int(os.environ.get("VILO_ANN_EF_SEARCH", "128"))
+
+# 0 means "pick from the corpus size" (about 4 * sqrt(n) lists)
+IVF_NLIST = int(os.environ.get("VILO_ANN_IVF_NLIST", "0"))
+DEFAULT_NPROBE = int(os.environ.get("VILO_ANN_NPROBE", "16"))
+# k-means only needs a sample; faiss recommends 39-256 points per list
+IVF_TRAIN_POINTS_PER_LIST = 256
+
+# Approximate indexes are asked for this many candidates instead of a full ranking.
+# HNSW searches with a beam of max(efSearch, k), so a large pool also raises the effective efSearch.
+ANN_CANDIDATES = int(os.environ.get("VILO_ANN_CANDIDATES", "100"))
+
+
+def choose_index_kind(n):
+    if n >= IVF_THRESHOLD:
+        return "ivf"
+    if n >= HNSW_THRESHOLD:
+        return "hnsw"
+    return "flat"
+
+
+def ivf_nlist(n):
+    if IVF_NLIST > 0:
+        return IVF_NLIST
+    return max(1, min(int(4 * math.sqrt(n)), n // 39 or 1))
+
+
+def build_ann_index(embeddings, kind=None):
+    """
+    Build an inner-product index over unit vectors (float32, shape (n, d)).
+    `kind` overrides the size-based choice: "flat", "hnsw" or "ivf".
+    """
+    n, dimension = embeddings.shape
+    kind = kind or choose_index_kind(n)
+
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = DEFAULT_EF_SEARCH
+    elif kind == "ivf":
+        nlist = ivf_nlist(n)
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+        train_size = min(n, nlist * IVF_TRAIN_POINTS_PER_LIST)
+        if train_size < n:
+            sample = np.random.default_rng(0).choice(n, train_size, replace=False)
+            index.train(embeddings[np.sort(sample)])
+        else:
+            index.train(embeddings)
+        index.nprobe = min(DEFAULT_NPROBE, nlist)
+    else:
+        index = faiss.IndexFlatIP(dimension)
+
+    index.add(embeddings)
+    print(f"Built {kind} index over {n} vectors")
+    return index
+
+
+def index_kind(index):
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def is_exact(index):
+    return index_kind(index) == "flat"
+
+
+def search_params(index, ef_search=None, nprobe=None):
+    """
+    Per-call search parameters. Passed to index.search(params=...) so concurrent
+    requests against a shared cached index do not overwrite each other's settings.
+    """
+    kind = index_kind(index)
+    if kind == "hnsw" and ef_search:
+        return faiss.SearchParametersHNSW(efSearch=int(ef_search))
+    if kind == "ivf" and nprobe:
+        return faiss.SearchParametersIVF(nprobe=int(nprobe))
+    return None
+
+
+def flat_vectors(index):
+    """The unit vectors stored in an exact index, shape (n, d) in insertion (chunk id) order, without a copy."""
+    return faiss.rev_swig_ptr(index.get_xb(), index.ntotal * index.d).reshape(index.ntotal, index.d)
+
+
+def candidate_count(index, num_chunks, top_k=None):
+    """How many neighbours to request from an approximate index."""
+    return min(num_chunks, max(ANN_CANDIDATES, 10 * (top_k or 0)))
+
+
+def search(index, queries, k, ef_search=None, nprobe=None):
+    params = search_params(index, ef_search, nprobe)
+    if params is None:
+        return index.search(queries, k)
+    return index.search(queries, k, params=params)
@@ -0,0 +1,316 @@
+import fnmatch
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from utils.single_flight import discard_locks
+
+# Disk budget for document artifacts under processed/, in MB (0 = unbounded)
+CACHE_MAX_MB = float(os.environ.get("VILO_CACHE_MAX_MB", "2048"))
+# Extra LRU lifetime (seconds) per second an artifact took to build, so an expensive
+# conversion outlives a cheap index that was last used at about the same time
+COST_WEIGHT = float(os.environ.get("VILO_CACHE_COST_WEIGHT", "60"))
+
+# Artifacts used this recently are never evicted: a request may still be reading them
+MIN_AGE_SECONDS = 60
+# last_access is rewritten at most this often per artifact
+TOUCH_INTERVAL = 10
+
+# Rebuild cost (seconds) assumed for each artifact kind when no build time was measured
+DEFAULT_COSTS = {
+    "markdown": 30.0,      # Docling conversion
+    "chunks": 10.0,        # chunking + embedding
+    "index": 1.0,          # FAISS + BM25, rebuilt from the chunks
+    "summary": 60.0,       # LLM calls
+    "summary_pdf": 1.0,    # rendered from the cached summary
+    "legacy": 0.0,         # files from the old stem-named layout, evicted first
+}
+
+MANIFEST_NAME = "artifacts.sqlite"
+# single_flight lock files, named "<step>-<doc hash>.lock"
+LOCKS_DIR = "locks"
+
+# Top-level entries of processed/ written by the old stem-named layout; only these are
+# adopted as "legacy" artifacts, anything else in processed/ is left alone
+LEGACY_DIRS = {"markdown_cache", "indexes"}
+LEGACY_FILE_PATTERNS = ("*.md", "*_chunks.*")
+
+
+def document_dir(output_folder, doc_hash):
+    """Directory holding every artifact derived from one document (by content hash)."""
+    return Path(output_folder) / "documents" / doc_hash
+
+
+def artifact_kind(name):
+    """Kind of a file or directory inside a document directory, or None for unknown / temp files."""
+    if name.startswith("."):
+        return None
+    if name.startswith("markdown-") and name.endswith(".md"):
+        return "markdown"
+    if name.startswith("chunks."):
+        return "chunks"
+    if name.startswith("index_v"):
+        return "index"
+    if name == "summary.md":
+        return "summary"
+    if name == "summary.pdf":
+        return "summary_pdf"
+    return None
+
+
+def is_legacy_entry(entry):
+    if entry.name.startswith("."):
+        return False
+    if entry.is_dir():
+        return entry.name in LEGACY_DIRS
+    return any(fnmatch.fnmatch(entry.name, pattern) for pattern in LEGACY_FILE_PATTERNS)
+
+
+def _artifact_files(path):
+    # A file, every file under a directory, or the files sharing a base name (a chunk store is <base>.meta.json + <base>.emb.npy)
+    if path.is_dir():
+        return [p for p in path.rglob("*") if p.is_file()]
+    if path.exists():
+        return [path]
+    if path.parent.is_dir():
+        return [p for p in path.parent.iterdir() if p.is_file() and p.name.startswith(path.name + ".")]
+    return []
+
+
+def _artifact_size(path):
+    size = 0
+    for p in _artifact_files(path):
+        try:
+            size += p.stat().st_size
+        except OSError:
+            pass
+    return size
+
+
+def _remove_artifact(path):
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+        return
+    for p in _artifact_files(path):
+        try:
+            p.unlink()
+        except OSError:
+            pass
+
+
+class ArtifactCache:
+    """
+    Size-bounded cache of the files derived from uploaded documents (markdown, chunk stores,
+    indexes, summaries). The files themselves live under processed/documents/<hash>/; a SQLite
+    manifest records each artifact's kind, size, build cost and last use.
+
+    When the total size exceeds the budget, artifacts are evicted in order of
+    last_access + COST_WEIGHT * cost, i.e. least recently used first, with expensive kinds
+    (conversions, summaries) kept longer than cheap ones (indexes, PDFs).
+    """
+
+    def __init__(self, root, max_bytes=None, cost_weight=COST_WEIGHT):
+        self.root = Path(root).resolve()
+        self.max_bytes = int(CACHE_MAX_MB * 1024 * 1024) if max_bytes is None else max_bytes
+        self.cost_weight = cost_weight
+        self.path = self.root / MANIFEST_NAME
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._scanned = False
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS artifacts ("
+                "path TEXT PRIMARY KEY, doc_hash TEXT, kind TEXT NOT NULL, name TEXT, "
+                "size INTEGER NOT NULL, cost REAL NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS artifacts_doc_hash ON artifacts(doc_hash)")
+            conn.commit()
+            self._local.conn = conn
+        with self._lock:
+            scan = not self._scanned
+            self._scanned = True
+        if scan:
+            self.scan(conn)
+        return conn
+
+    def _key(self, path):
+        return Path(path).resolve().relative_to(self.root).as_posix()
+
+    def record(self, path, kind, doc_hash=None, cost=None, name=None):
+        """
+        Register a freshly written artifact (a file, a directory, or a chunk store base path),
+        then evict down to the budget if needed.
+        """
+        conn = self._conn()
+        now = time.time()
+        cost = DEFAULT_COSTS.get(kind, 0.0) if cost is None else cost
+        conn.execute(
+            "INSERT OR REPLACE INTO artifacts (path, doc_hash, kind, name, size, cost, created, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (self._key(path), doc_hash, kind, name, _artifact_size(Path(path)), cost, now, now),
+        )
+        conn.commit()
+        self.evict()
+
+    def touch(self, path):
+        """Mark an artifact as used."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "UPDATE artifacts SET last_access = ? WHERE path = ? AND last_access < ?",
+            (now, self._key(path), now - TOUCH_INTERVAL),
+        )
+        conn.commit()
+
+    def total_bytes(self):
+        return self._conn().execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+
+    def evict(self, max_bytes=None):
+        """
+        Remove artifacts until the cache fits in max_bytes (default: the configured budget).
+        Returns the removed artifact paths.
+        """
+        budget = self.max_bytes if max_bytes is None else max_bytes
+        conn = self._conn()
+        total = self.total_bytes()
+        if not budget or total <= budget:
+            return []
+
+        rows = conn.execute(
+            "SELECT path, size, doc_hash FROM artifacts WHERE last_access < ? ORDER BY last_access + cost * ? ASC",
+            (time.time() - MIN_AGE_SECONDS, self.cost_weight),
+        ).fetchall()
+        removed = []
+        doc_hashes = set()
+        for key, size, doc_hash in rows:
+            if total <= budget:
+                break
+            _remove_artifact(self.root / key)
+            conn.execute("DELETE FROM artifacts WHERE path = ?", (key,))
+            total -= size
+            removed.append(key)
+            if doc_hash:
+                doc_hashes.add(doc_hash)
+        conn.commit()
+        for doc_hash in doc_hashes:
+            self._clean_up_document(doc_hash)
+
+        if removed:
+            evicted = sum(row[1] for row in rows[:len(removed)])
+            with self._lock:
+                self.evictions += len(removed)
+                self.evicted_bytes += evicted
+            print(f"Evicted {len(removed)} cached artifacts ({evicted / 1e6:.1f} MB)")
+        return removed
+
+    def invalidate(self, doc_hash):
+        """Remove every artifact of one document. Returns the number of bytes freed."""
+        conn = self._conn()
+        freed = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM artifacts WHERE doc_hash = ?", (doc_hash,)).fetchone()[0]
+        conn.execute("DELETE FROM artifacts WHERE doc_hash = ?", (doc_hash,))
+        conn.commit()
+        shutil.rmtree(document_dir(self.root, doc_hash), ignore_errors=True)
+        discard_locks(self.root / LOCKS_DIR, f"*-{doc_hash}.lock")
+        print(f"Invalidated cached artifacts of document {doc_hash}")
+        return freed
+
+    def _clean_up_document(self, doc_hash):
+        # After an eviction: drop the document directory once it is empty, and its idle lock files
+        try:
+            document_dir(self.root, doc_hash).rmdir()
+        except OSError:  # still holds artifacts (or is already gone)
+            pass
+        discard_locks(self.root / LOCKS_DIR, f"*-{doc_hash}.lock")
+
+    def scan(self, conn=None):
+        """
+        Reconcile the manifest with the disk: forget artifacts whose files are gone and adopt
+        untracked ones (written before the manifest existed, or by the old stem-named layout).
+        """
+        conn = conn or self._conn()
+        tracked = {key for (key,) in conn.execute("SELECT path FROM artifacts")}
+        gone = [key for key in tracked if not _artifact_files(self.root / key)]
+        conn.executemany("DELETE FROM artifacts WHERE path = ?", [(key,) for key in gone])
+
+        found = []
+        documents = self.root / "documents"
+        if documents.is_dir():
+            for doc in documents.iterdir():
+                if not doc.is_dir():
+                    continue
+                for entry in doc.iterdir():
+                    kind = artifact_kind(entry.name)
+                    path = doc / "chunks" if kind == "chunks" else entry
+                    found.append((path, kind, doc.name))
+        for entry in self.root.iterdir():
+            if is_legacy_entry(entry):
+                found.append((entry, "legacy", None))
+
+        adopted = {}
+        for path, kind, doc_hash in found:
+            key = self._key(path)
+            if kind is None or key in tracked or key in adopted:
+                continue
+            try:
+                mtime = max(p.stat().st_mtime for p in _artifact_files(path))
+            except (OSError, ValueError):
+                continue
+            adopted[key] = (key, doc_hash, kind, None, _artifact_size(path), DEFAULT_COSTS[kind], mtime, mtime)
+        conn.executemany(
+            "INSERT OR IGNORE INTO artifacts (path, doc_hash, kind, name, size, cost, created, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            list(adopted.values()),
+        )
+        conn.commit()
+        return len(adopted)
+
+    def stats(self):
+        conn = self._conn()
+        by_kind = {
+            kind: {"count": count, "bytes": size}
+            for kind, count, size in conn.execute("SELECT kind, COUNT(*), SUM(size) FROM artifacts GROUP BY kind")
+        }
+        documents = {}
+        rows = conn.execute(
+            "SELECT doc_hash, kind, name, size, cost, last_access FROM artifacts "
+            "WHERE doc_hash IS NOT NULL ORDER BY last_access DESC")
+        for doc_hash, kind, name, size, cost, last_access in rows:
+            doc = documents.setdefault(doc_hash, {"doc_hash": doc_hash, "name": None, "bytes": 0, "last_access": last_access, "artifacts": []})
+            doc["name"] = doc["name"] or name
+            doc["bytes"] += size
+            doc["artifacts"].append({"kind": kind, "bytes": size, "cost_seconds": cost, "last_access": last_access})
+        with self._lock:
+            evictions, evicted_bytes = self.evictions, self.evicted_bytes
+        return {
+            "path": str(self.root),
+            "max_bytes": self.max_bytes,
+            "total_bytes": sum(k["bytes"] for k in by_kind.values()),
+            "by_kind": by_kind,
+            "evictions": evictions,
+            "evicted_bytes": evicted_bytes,
+            "documents": list(documents.values()),
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_artifact_cache(output_folder):
+    """The process-wide cache for an output folder, opened on first use."""
+    root = Path(output_folder).resolve()
+    with _caches_lock:
+        cache = _caches.get(root)
+        if cache is None:
+            cache = _caches[root] = ArtifactCache(root)
+        return cache
@@ -0,0 +1,125 @@
+import os
+import json
+from model_init.model import query_model
+from utils.llm_executor import iter_concurrently
+
+# Chunks per prompt for Q&A / flashcard generation (1 = one prompt per chunk, the old behaviour)
+BATCH_CHUNKS = int(os.environ.get("VILO_GEN_BATCH_CHUNKS", "4"))
+# Upper bound on chunk text per batched prompt, in characters
+BATCH_MAX_CHARS = int(os.environ.get("VILO_GEN_BATCH_CHARS", "6000"))
+
+
+def parse_json_response(content):
+    """Parse a model reply that should be JSON, tolerating a ```json fence. Returns None if it is not valid JSON."""
+    content = content.strip()
+    if content.startswith("```json"):
+        content = content[7:]
+    elif content.startswith("```"):
+        content = content[3:]
+    if content.endswith("```"):
+        content = content[:-3]
+    try:
+        return json.loads(content.strip())
+    except ValueError:
+        return None
+
+
+def chunk_id(i):
+    return f"c{i + 1}"
+
+
+def make_batches(tasks, batch_chunks=None, max_chars=None):
+    """
+    Split (location, text) tasks into consecutive batches of at most batch_chunks chunks
+    and max_chars characters. Each batch is a list of (task_index, location, text).
+    """
+    batch_chunks = batch_chunks or BATCH_CHUNKS
+    max_chars = max_chars or BATCH_MAX_CHARS
+    batches = []
+    current = []
+    current_chars = 0
+    for i, (location, text) in enumerate(tasks):
+        if current and (len(current) >= batch_chunks or current_chars + len(text) > max_chars):
+            batches.append(current)
+            current = []
+            current_chars = 0
+        current.append((i, location, text))
+        current_chars += len(text)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _with_location(items, location):
+    return [dict(item, location=location) for item in items or [] if isinstance(item, dict)]
+
+
+def iter_batched(tasks, build_batch_prompt, generate_single, api_key, batch_chunks=None, max_concurrency=None):
+    """
+    Generate items for many chunks with one prompt per batch of chunks.
+
+    build_batch_prompt(batch) must ask for a JSON object mapping chunk_id(i) to a list of items.
+    generate_single(text, location) is the per-chunk fallback, used for any chunk whose entry
+    is missing or malformed in the batched reply.
+
+    Yields (task_index, items) per chunk as each batch completes; every item carries its chunk's location.
+    """
+    batch_chunks = batch_chunks or BATCH_CHUNKS
+    if batch_chunks <= 1:
+        def run_single(task):
+            location, text = task
+            return _with_location(generate_single(text, location), location)
+        yield from iter_concurrently(run_single, tasks, max_concurrency=max_concurrency)
+        return
+
+    def run_batch(batch):
+        if len(batch) == 1:
+            _, location, text = batch[0]
+            return [(batch[0][0], _with_location(generate_single(text, location), location))]
+
+        try:
+            data = parse_json_response(query_model(build_batch_prompt(batch), api_key=api_key))
+        except Exception as e:
+            print(f"Error querying model for batch of {len(batch)} chunks: {e}")
+            data = None
+        if not isinstance(data, dict):
+            data = {}
+
+        results = []
+        for i, location, text in batch:
+            items = data.get(chunk_id(i))
+            if not isinstance(items, list):
+                # Missing or unparsable in the batched reply: retry this chunk on its own
+                print(f"Retrying chunk {i + 1} individually")
+                items = generate_single(text, location)
+            results.append((i, _with_location(items, location)))
+        return results
+
+    for _, batch_results in iter_concurrently(run_batch, make_batches(tasks, batch_chunks), max_concurrency=max_concurrency):
+        yield from batch_results
+
+
+def generate_batched(tasks, build_batch_prompt, generate_single, api_key, batch_chunks=None, max_concurrency=None, progress=None):
+    """
+    Ordered version of iter_batched: returns one item list per task, in task order.
+    progress(done_chunks, total_chunks) is called as batches complete.
+    """
+    results = [[] for _ in tasks]
+    for done, (i, items) in enumerate(iter_batched(tasks, build_batch_prompt, generate_single, api_key, batch_chunks, max_concurrency), 1):
+        results[i] = items
+        if progress:
+            progress(done, len(tasks))
+    return results
+
+
+def format_batch_chunks(batch, instructions_for):
+    """The chunk section of a batched prompt: one labelled block per chunk with its own instructions."""
+    blocks = []
+    for i, location, text in batch:
+        blocks.append(
+            f'Chunk id: {chunk_id(i)}\n'
+            f'Location: {location or "Unknown"}\n'
+            f'{instructions_for(text)}\n'
+            f'Text:\n"""{text}"""'
+        )
+    return "\n\n".join(blocks)
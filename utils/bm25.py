@@ -0,0 +1,113 @@
+import io
+import json
+from collections import Counter
+import numpy as np
+from scipy import sparse
+from utils.file_hash import atomic_write_bytes
+
+
+class SparseBM25:
+    """
+    Okapi BM25 over a sparse term-document matrix.
+
+    Scores match rank_bm25.BM25Okapi (same k1 / b / epsilon IDF floor), but the
+    per-term weights idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl)) are
+    computed once at build time and stored as a CSR matrix (terms x documents).
+    Scoring a batch of queries is then a single sparse matrix product.
+    """
+
+    def __init__(self, corpus=None, k1=1.5, b=0.75, epsilon=0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.vocab = {}
+        self.weights = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self.corpus_size = 0
+        if corpus is not None:
+            self._build(corpus)
+
+    def _build(self, corpus):
+        rows, cols, tfs = [], [], []
+        doc_len = np.zeros(len(corpus), dtype=np.float64)
+        for d, tokens in enumerate(corpus):
+            doc_len[d] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                rows.append(self.vocab.setdefault(term, len(self.vocab)))
+                cols.append(d)
+                tfs.append(tf)
+
+        self.corpus_size = len(corpus)
+        num_terms = len(self.vocab)
+        if not self.corpus_size:
+            return
+
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        tfs = np.asarray(tfs, dtype=np.float64)
+
+        # IDF with the BM25Okapi floor: terms in more than half the documents get epsilon * mean idf
+        doc_freq = np.bincount(rows, minlength=num_terms).astype(np.float64)
+        idf = np.log(self.corpus_size - doc_freq + 0.5) - np.log(doc_freq + 0.5)
+        if num_terms:
+            idf[idf < 0] = self.epsilon * idf.mean()
+
+        avgdl = doc_len.sum() / self.corpus_size
+        norm = self.k1 * (1 - self.b + self.b * doc_len / avgdl) if avgdl else np.full_like(doc_len, self.k1)
+        data = idf[rows] * tfs * (self.k1 + 1) / (tfs + norm[cols])
+
+        self.weights = sparse.csr_matrix(
+            (data.astype(np.float32), (rows, cols)), shape=(num_terms, self.corpus_size))
+
+    def _query_matrix(self, queries):
+        # One row per query holding the count of each known term (repeated terms count repeatedly, as in BM25Okapi)
+        indptr, indices, data = [0], [], []
+        for tokens in queries:
+            counts = Counter(self.vocab[t] for t in tokens if t in self.vocab)
+            indices.extend(counts.keys())
+            data.extend(counts.values())
+            indptr.append(len(indices))
+        return sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(queries), len(self.vocab)))
+
+    def get_batch_scores(self, queries):
+        """Scores of every tokenized query against every document, shape (len(queries), corpus_size)."""
+        queries = list(queries)
+        if not queries or not self.corpus_size:
+            return np.zeros((len(queries), self.corpus_size), dtype=np.float32)
+        return (self._query_matrix(queries) @ self.weights).toarray()
+
+    def get_scores(self, query):
+        return self.get_batch_scores([query])[0]
+
+    def to_bytes(self):
+        buf = io.BytesIO()
+        # The vocabulary is stored in column order as one JSON array
+        terms = [None] * len(self.vocab)
+        for term, i in self.vocab.items():
+            terms[i] = term
+        np.savez(
+            buf,
+            data=self.weights.data,
+            indices=self.weights.indices,
+            indptr=self.weights.indptr,
+            shape=np.asarray(self.weights.shape, dtype=np.int64),
+            params=np.asarray([self.k1, self.b, self.epsilon], dtype=np.float64),
+            vocab=np.frombuffer(json.dumps(terms).encode("utf-8"), dtype=np.uint8),
+        )
+        return buf.getvalue()
+
+    def save(self, path):
+        atomic_write_bytes(path, self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            k1, b, epsilon = f["params"].tolist()
+            bm25 = cls(k1=k1, b=b, epsilon=epsilon)
+            terms = json.loads(f["vocab"].tobytes().decode("utf-8"))
+            bm25.vocab = {term: i for i, term in enumerate(terms)}
+            bm25.weights = sparse.csr_matrix(
+                (f["data"], f["indices"], f["indptr"]), shape=tuple(f["shape"].tolist()))
+        bm25.corpus_size = bm25.weights.shape[1]
+        return bm25
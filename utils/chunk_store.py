@@ -0,0 +1,112 @@
+import gzip
+import io
+import json
+from pathlib import Path
+import numpy as np
+from utils.file_hash import atomic_write_bytes
+
+# A chunk store is two files sharing a base path:
+#   <base>.meta.json[.gz]  -> [{"text": ..., "metadata": {...}}, ...] without embeddings
+#   <base>.emb.npy / .npz  -> float32 matrix, row i is the embedding of chunk i
+
+def _store_paths(base_path):
+    base = Path(base_path)
+    return {
+        "meta": base.with_name(base.name + ".meta.json"),
+        "meta_gz": base.with_name(base.name + ".meta.json.gz"),
+        "emb": base.with_name(base.name + ".emb.npy"),
+        "emb_gz": base.with_name(base.name + ".emb.npz"),
+    }
+
+
+def chunk_store_exists(base_path):
+    paths = _store_paths(base_path)
+    return paths["meta"].exists() or paths["meta_gz"].exists()
+
+
+def split_embeddings(chunks):
+    """
+    Separate inline `metadata["embedding"]` lists from the chunks.
+    Returns (chunks_without_embeddings, float32 matrix or None).
+    """
+    records = []
+    vectors = []
+    for chunk in chunks:
+        metadata = dict(chunk.get("metadata", {}))
+        emb = metadata.pop("embedding", None)
+        if emb is not None:
+            vectors.append(emb)
+        records.append({**chunk, "metadata": metadata})
+
+    if vectors and len(vectors) == len(records):
+        return records, np.asarray(vectors, dtype="float32")
+    return records, None
+
+
+def save_chunk_store(chunks, base_path, embeddings=None, compress=False):
+    """
+    Write chunks as compact JSON metadata plus a contiguous float32 embedding matrix.
+    With compress=True both files are compressed (the embeddings can then no longer be memory-mapped).
+    """
+    records, inline_embeddings = split_embeddings(chunks)
+    if embeddings is None:
+        embeddings = inline_embeddings
+    paths = _store_paths(base_path)
+
+    # Embeddings first: the metadata file marks the store as complete
+    if embeddings is not None:
+        buf = io.BytesIO()
+        if compress:
+            np.savez_compressed(buf, embeddings=np.asarray(embeddings, dtype="float32"))
+            atomic_write_bytes(paths["emb_gz"], buf.getvalue())
+        else:
+            np.save(buf, np.ascontiguousarray(embeddings, dtype="float32"))
+            atomic_write_bytes(paths["emb"], buf.getvalue())
+
+    meta_bytes = json.dumps(records, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if compress:
+        atomic_write_bytes(paths["meta_gz"], gzip.compress(meta_bytes))
+    else:
+        atomic_write_bytes(paths["meta"], meta_bytes)
+
+    return records
+
+
+def load_chunks(base_path):
+    """
+    Load chunk text and metadata only. Embeddings are read separately with load_embeddings.
+    """
+    paths = _store_paths(base_path)
+    if paths["meta"].exists():
+        with open(paths["meta"], "r", encoding="utf-8") as f:
+            return json.load(f)
+    with gzip.open(paths["meta_gz"], "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_embeddings(base_path, mmap=True):
+    """
+    Return the embedding matrix of a chunk store, memory-mapped when stored uncompressed.
+    Returns None if the store has no embeddings.
+    """
+    paths = _store_paths(base_path)
+    if paths["emb"].exists():
+        return np.load(paths["emb"], mmap_mode="r" if mmap else None)
+    if paths["emb_gz"].exists():
+        with np.load(paths["emb_gz"]) as data:
+            return data["embeddings"]
+    return None
+
+
+def migrate_legacy_json(json_path, base_path, compress=False):
+    """
+    Convert an old `<stem>_chunks.json` file (embeddings inline) into a chunk store.
+    Raises ValueError if the file is not a chunk list with an embedding for every chunk.
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        chunks = json.load(f)
+    if not isinstance(chunks, list) or not all(isinstance(c, dict) and "text" in c for c in chunks):
+        raise ValueError(f"Not a chunk list: {json_path}")
+    if chunks and split_embeddings(chunks)[1] is None:
+        raise ValueError(f"Chunks without embeddings: {json_path}")
+    return save_chunk_store(chunks, base_path, compress=compress)
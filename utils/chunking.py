@@ -1,9 +1,84 @@
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Dict
-from wordsegment import load, segment
 import re
+import threading
+import wordsegment
+
+# wordsegment reads its unigram/bigram tables from files bundled with the package;
+# load them on first use instead of at import time
+_wordsegment_loaded = False
+_wordsegment_lock = threading.Lock()
+
+def load_wordsegment():
+    global _wordsegment_loaded
+    if not _wordsegment_loaded:
+        with _wordsegment_lock:
+            if not _wordsegment_loaded:
+                wordsegment.load()
+                _wordsegment_loaded = True
+    return wordsegment
+
+def segment(word):
+    return load_wordsegment().segment(word)
+
+# Segmentations of long words; textbooks repeat the same words thousands of times
+@lru_cache(maxsize=200_000)
+def _segment_cached(word):
+    return tuple(segment(word))
+
+# Patterns compiled once instead of on every line
+_IMAGE_COMMENT = re.compile(r"<!--\s*image\s*-->", re.IGNORECASE)
+_FORMULA_COMMENT = re.compile(r"<!--\s*formula-not-decoded\s*-->", re.IGNORECASE)
+_HTML_COMMENT = re.compile(r"<!--.*?-->", re.DOTALL)
+_MANY_NEWLINES = re.compile(r"\n{4,}")
+_SPACES = re.compile(r"[ \t]+")
+_CAMEL_CASE = re.compile(r"([a-z])([A-Z])")
+_HEADER_PREFIX = re.compile(r"^#{1,6}\s+")
+_LIST_OR_QUOTE_PREFIX = re.compile(r"^[\*\-\+]\s+|^(\d+\.)\s+|^>\s+")
+_TABLE_SEPARATOR = re.compile(r"^\|[\-\:\|\s]+\|\s*$")
+_WORD_PREFIX = re.compile(r"^[\W_]*")
+_WORD_SUFFIX = re.compile(r"[\W_]*$")
+_HEADER = re.compile(r"^(#{1,6})\s+(.*)")
+_LIST_START = re.compile(r"^[\*\-\+]\s+|^(\d+\.)\s+")
+_LIST_CONTINUATION = re.compile(r"^[\t ]*[\*\-\+]\s+|^[\t ]*(\d+\.)\s+|^[\t ]{2,}")
+_NUMBERED_ITEM = re.compile(r"^\d+\.\s+")
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+_HTML_ENTITIES = {"&amp;": "&", "&lt;": "<", "&gt;": ">", "&quot;": '"', "&#39;": "'", "&nbsp;": " ", "&apos;": "'"}
+
+# Words this short can never have a core longer than 12 characters, so they skip segmentation
+_SEGMENT_MIN_LEN = 13
+
+
+def _split_long_words(line):
+    words = []
+    for word in line.split():
+        if len(word) < _SEGMENT_MIN_LEN:
+            words.append(word)
+            continue
+        prefix = _WORD_PREFIX.match(word).group()
+        suffix = _WORD_SUFFIX.search(word).group()
+        core = word[len(prefix): len(word)-len(suffix) if suffix else None]
+
+        if len(core) > 12 and core.isalpha() and not core.isupper():
+            segs = _segment_cached(core.lower())
+            if len(segs) > 1 and all(len(w) > 1 for w in segs):
+                words.append(prefix + " ".join(segs) + suffix)
+                continue
+        words.append(word)
+    return " ".join(words)
+
+
+def _chunk_metadata(header_stack, sections, size, source_name):
+    return {
+        "header": " > ".join(h[0] for h in header_stack) if header_stack else "Root",
+        "sections": sections,
+        "size": size,
+        "source_file": source_name,
+        "chunk_type": "mixed" if len(set(sections)) > 1 else sections[0]
+    }
 
-load()
 
 def adaptive_chunk_markdown(
     file_path: Path = None,
@@ -26,57 +101,45 @@ def adaptive_chunk_markdown(
     if not text.strip():
         return [{"text": "", "metadata": {"warning": "Empty file", "source_file": source_name}}]
 
-    text = re.sub(r"<!--\s*image\s*-->", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"<!--\s*formula-not-decoded\s*-->", "[Formula]", text, flags=re.IGNORECASE)
-    text = re.sub(r"<!--.*?-->", "", text, flags=re.DOTALL)
+    text = _IMAGE_COMMENT.sub("", text)
+    text = _FORMULA_COMMENT.sub("[Formula]", text)
+    text = _HTML_COMMENT.sub("", text)
 
-    html_entities = {"&amp;": "&", "&lt;": "<", "&gt;": ">", "&quot;": '"', "&#39;": "'", "&nbsp;": " ", "&apos;": "'"}
-    for entity, char in html_entities.items():
+    for entity, char in _HTML_ENTITIES.items():
         text = text.replace(entity, char)
 
-    text = re.sub(r"\n{4,}", "\n\n\n", text)
-    text = re.sub(r"[ \t]+", " ", text)
-    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text)
+    text = _MANY_NEWLINES.sub("\n\n\n", text)
+    text = _SPACES.sub(" ", text)
+    text = _CAMEL_CASE.sub(r"\1 \2", text)
 
     _lines = []
     for line in text.split("\n"):
         s = line.strip()
         if (s.startswith(("```", "|")) or
-            re.match(r"^#{1,6}\s+", s) or
-            re.match(r"^[\*\-\+]\s+|^(\d+\.)\s+|^>\s+", s) or
-            re.match(r"^\|[\-\:\|\s]+\|\s*$", s)):
+            _HEADER_PREFIX.match(s) or
+            _LIST_OR_QUOTE_PREFIX.match(s) or
+            _TABLE_SEPARATOR.match(s)):
             _lines.append(line)
             continue
-
-        words = []
-        for word in line.split():
-            prefix = re.match(r"^[\W_]*", word).group()
-            suffix = re.search(r"[\W_]*$", word).group()
-            core = word[len(prefix): len(word)-len(suffix) if suffix else None]
-
-            if len(core) > 12 and core.isalpha() and not core.isupper():
-                segs = segment(core.lower())
-                if len(segs) > 1 and all(len(w) > 1 for w in segs):
-                    words.append(prefix + " ".join(segs) + suffix)
-                    continue
-            words.append(word)
-        _lines.append(" ".join(words))
+        _lines.append(_split_long_words(line))
 
     text = "\n".join(_lines)
-    lines = text.split("\n")
+    lines = _lines
+    n_lines = len(lines)
+    stripped_lines = [line.strip() for line in lines]
 
     sections = []
     i = 0
-    while i < len(lines):
+    while i < n_lines:
         line = lines[i]
-        stripped = line.strip()
+        stripped = stripped_lines[i]
 
         if not stripped:
             i += 1
             continue
 
         # Headers
-        header_match = re.match(r"^(#{1,6})\s+(.*)", stripped)
+        header_match = _HEADER.match(stripped)
         if header_match:
             level = len(header_match.group(1))
             sections.append(("header", line, i, i+1, level))
@@ -87,7 +150,7 @@ def adaptive_chunk_markdown(
         if stripped.startswith("```"):
             start = i
             i += 1
-            while i < len(lines) and not lines[i].strip().startswith("```"):
+            while i < n_lines and not stripped_lines[i].startswith("```"):
                 i += 1
             i += 1
             content = "\n".join(lines[start:i])
@@ -98,19 +161,19 @@ def adaptive_chunk_markdown(
         if stripped.startswith("|") and stripped.endswith("|"):
             start = i
             i += 1
-            if i < len(lines) and re.match(r"^\|[\-\:\|\s]+\|\s*$", lines[i].strip()):
+            if i < n_lines and _TABLE_SEPARATOR.match(stripped_lines[i]):
                 i += 1
-            while i < len(lines) and lines[i].strip().startswith("|") and not re.match(r"^\|[\-\:\|\s]+\|\s*$", lines[i].strip()):
+            while i < n_lines and stripped_lines[i].startswith("|") and not _TABLE_SEPARATOR.match(stripped_lines[i]):
                 i += 1
             content = "\n".join(lines[start:i])
             sections.append(("table", content, start, i, 0))
             continue
 
-        if re.match(r"^[\*\-\+]\s+|^(\d+\.)\s+", stripped):
+        if _LIST_START.match(stripped):
             start = i
-            while i < len(lines):
-                curr = lines[i].strip()
-                if not curr or not re.match(r"^[\t ]*[\*\-\+]\s+|^[\t ]*(\d+\.)\s+|^[\t ]{2,}", curr):
+            while i < n_lines:
+                curr = stripped_lines[i]
+                if not curr or not _LIST_CONTINUATION.match(curr):
                     break
                 i += 1
             content = "\n".join(lines[start:i])
@@ -120,7 +183,7 @@ def adaptive_chunk_markdown(
         # Blockquotes
         if stripped.startswith(">"):
             start = i
-            while i < len(lines) and lines[i].strip().startswith(">"):
+            while i < n_lines and stripped_lines[i].startswith(">"):
                 i += 1
             content = "\n".join(lines[start:i])
             sections.append(("quote", content, start, i, 0))
@@ -128,25 +191,28 @@ def adaptive_chunk_markdown(
 
         # Paragraphs
         start = i
-        para_lines = []
-        while i < len(lines):
-            curr = lines[i].strip()
-            if not curr or curr.startswith(("```", "#", ">", "|", "*", "-", "+", "1.")) or re.match(r"^\d+\.\s+", curr):
+        while i < n_lines:
+            curr = stripped_lines[i]
+            # The first line always belongs to the paragraph: lines like "**Bold**" or "1.5 ..."
+            # match no block above and would otherwise never be consumed
+            if i > start and (not curr or curr.startswith(("```", "#", ">", "|", "*", "-", "+", "1.")) or _NUMBERED_ITEM.match(curr)):
+                break
+            if not curr:
                 break
-            para_lines.append(lines[i])
             i += 1
-        if para_lines:
-            content = "\n".join(para_lines)
-            sections.append(("paragraph", content, start, i, 0))
+        content = "\n".join(lines[start:i])
+        sections.append(("paragraph", content, start, i, 0))
 
     chunks = []
-    current_text = ""
+    # The current chunk is kept as a list of parts joined by "\n\n" only when it is emitted,
+    # with its joined length tracked separately, so building it stays linear.
+    current_parts = []
+    current_size = 0
     current_sections = []
     header_stack = []
 
     for sec_type, content, line_start, line_end, level in sections:
         content_size = len(content)
-        current_size = len(current_text)
 
         if sec_type == "header":
             header_text = content.lstrip("# ").strip()
@@ -164,46 +230,40 @@ def adaptive_chunk_markdown(
         elif current_size + content_size + 50 > max_size and current_size > 0:
             should_split = True
 
+        current_text = "\n\n".join(current_parts) if should_split else None
         if should_split and current_text.strip():
-            header_path = " > ".join(h[0] for h in header_stack) if header_stack else "Root"
+            chunk_text = current_text.strip()
             chunks.append({
-                "text": current_text.strip(),
-                "metadata": {
-                    "header": header_path,
-                    "sections": current_sections.copy(),
-                    "size": len(current_text.strip()),
-                    "source_file": source_name,
-                    "chunk_type": "mixed" if len(set(current_sections)) > 1 else current_sections[0]
-                }
+                "text": chunk_text,
+                "metadata": _chunk_metadata(header_stack, current_sections.copy(), len(chunk_text), source_name)
             })
 
             # Overlap
-            if overlap > 0 and len(current_text) > overlap:
-                current_text = current_text[-overlap:] + "\n\n" + content
+            if overlap > 0 and current_size > overlap:
+                current_parts = [current_text[-overlap:], content]
+                current_size = overlap + 2 + content_size
             else:
-                current_text = content
+                current_parts = [content]
+                current_size = content_size
             current_sections = [sec_type]
 
         else:
-            if current_text:
-                current_text += "\n\n" + content
+            if current_size:
+                current_parts.append(content)
+                current_size += 2 + content_size
             else:
-                current_text = content
+                current_parts = [content]
+                current_size = content_size
             if sec_type not in current_sections:
                 current_sections.append(sec_type)
 
     #  chunk
+    current_text = "\n\n".join(current_parts)
     if current_text.strip():
-        header_path = " > ".join(h[0] for h in header_stack) if header_stack else "Root"
+        chunk_text = current_text.strip()
         chunks.append({
-            "text": current_text.strip(),
-            "metadata": {
-                "header": header_path,
-                "sections": current_sections,
-                "size": len(current_text.strip()),
-                "source_file": source_name,
-                "chunk_type": "mixed" if len(set(current_sections)) > 1 else current_sections[0]
-            }
+            "text": chunk_text,
+            "metadata": _chunk_metadata(header_stack, current_sections, len(chunk_text), source_name)
         })
 
     if not chunks and text.strip():
@@ -221,21 +281,30 @@ def adaptive_chunk_markdown(
     final_chunks = []
     for chunk in chunks:
         if chunk["metadata"]["size"] > max_size * 1.8:
-            sentences = re.split(r'(?<=[.!?])\s+', chunk["text"])
-            sub = ""
+            sentences = _SENTENCE_END.split(chunk["text"])
+            # Same list-of-parts trick as above for the sentence accumulator
+            sub_parts = []
+            sub_size = 0
             for sent in sentences:
-                if len(sub) + len(sent) > max_size and sub:
+                if sub_size + len(sent) > max_size and sub_size:
+                    sub = " ".join(sub_parts).strip()
                     final_chunks.append({
-                        "text": sub.strip(),
-                        "metadata": {**chunk["metadata"], "size": len(sub.strip()), "note": "force_split_large"}
+                        "text": sub,
+                        "metadata": {**chunk["metadata"], "size": len(sub), "note": "force_split_large"}
                     })
-                    sub = sent
+                    sub_parts = [sent]
+                    sub_size = len(sent)
+                elif sub_size:
+                    sub_parts.append(sent)
+                    sub_size += 1 + len(sent)
                 else:
-                    sub += " " + sent if sub else sent
-            if sub.strip():
+                    sub_parts = [sent]
+                    sub_size = len(sent)
+            sub = " ".join(sub_parts).strip()
+            if sub:
                 final_chunks.append({
-                    "text": sub.strip(),
-                    "metadata": {**chunk["metadata"], "size": len(sub.strip())}
+                    "text": sub,
+                    "metadata": {**chunk["metadata"], "size": len(sub)}
                 })
         else:
             final_chunks.append(chunk)
@@ -1,16 +1,34 @@
 import re
-import nltk
-nltk.download('stopwords')
-from nltk.corpus import stopwords
+
+_stop_words = None
+
+def get_stop_words():
+    """
+    English stopwords from the local NLTK data, loaded once.
+    Nothing is downloaded at runtime; install the corpus ahead of time with
+    `python -m nltk.downloader stopwords`.
+    """
+    global _stop_words
+    if _stop_words is None:
+        from nltk.corpus import stopwords
+        try:
+            _stop_words = frozenset(stopwords.words("english"))
+        except LookupError as e:
+            raise LookupError(
+                "NLTK stopwords corpus not found locally. Run: python -m nltk.downloader stopwords"
+            ) from e
+    return _stop_words
+
+_NON_LETTERS = re.compile(r"[^a-z\s]")
 
 def clean_text(text):
-    stop_words = set(stopwords.words("english"))
+    stop_words = get_stop_words()
 
     # Lowercase
     text = text.lower()
 
     # Remove punctuation + numbers
-    text = re.sub(r"[^a-z\s]", " ", text)
+    text = _NON_LETTERS.sub(" ", text)
 
     # Tokenize
     tokens = text.split()
@@ -18,4 +36,4 @@ def clean_text(text):
     # Remove stopwords + remove single letters
     cleaned = [t for t in tokens if t not in stop_words and len(t) > 1]
 
-    return " ".join(cleaned)
\ No newline at end of file
+    return " ".join(cleaned)
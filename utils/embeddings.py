@@ -1,9 +1,65 @@
-from sentence_transformers import SentenceTransformer
+import time
+import numpy as np
+from utils.model_registry import get_embedding_model
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
+DEFAULT_BATCH_SIZE = 32
 
-def add_embeddings_to_chunks(chunks):
-    for chunk in chunks:
-        emb = model.encode(chunk["text"])
+# Timings of the most recent encode_texts call
+last_encode_stats = {}
+
+def encode_texts(texts, batch_size=DEFAULT_BATCH_SIZE, sort_by_length=True, normalize=True, verbose=True):
+    """
+    Encode a list of texts in batches and return a float32 matrix in input order.
+    sort_by_length groups texts of similar length per batch to limit padding waste.
+    normalize=True returns unit vectors, so inner product equals cosine similarity.
+    """
+    model = get_embedding_model()
+    texts = list(texts)
+    dim = model.get_sentence_embedding_dimension()
+    embeddings = np.empty((len(texts), dim), dtype="float32")
+    if not texts:
+        return embeddings
+
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i])) if sort_by_length else list(range(len(texts)))
+    num_batches = (len(order) + batch_size - 1) // batch_size
+    batch_times = []
+
+    for b, start in enumerate(range(0, len(order), batch_size), 1):
+        idx = order[start:start + batch_size]
+        t0 = time.perf_counter()
+        batch_emb = model.encode(
+            [texts[i] for i in idx],
+            batch_size=batch_size,
+            normalize_embeddings=normalize,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        embeddings[idx] = batch_emb
+        elapsed = time.perf_counter() - t0
+        batch_times.append(elapsed)
+        if verbose:
+            print(f"Embedded batch {b}/{num_batches} ({len(idx)} texts) in {elapsed:.2f}s")
+
+    total = sum(batch_times)
+    last_encode_stats.clear()
+    last_encode_stats.update({
+        "texts": len(texts),
+        "batches": num_batches,
+        "batch_size": batch_size,
+        "batch_seconds": batch_times,
+        "total_seconds": total,
+        "texts_per_second": len(texts) / total if total > 0 else None,
+    })
+    return embeddings
+
+
+def add_embeddings_to_chunks(chunks, batch_size=DEFAULT_BATCH_SIZE, sort_by_length=True, normalize=True):
+    embeddings = encode_texts(
+        [chunk["text"] for chunk in chunks],
+        batch_size=batch_size,
+        sort_by_length=sort_by_length,
+        normalize=normalize,
+    )
+    for chunk, emb in zip(chunks, embeddings):
         chunk["metadata"]["embedding"] = emb.tolist()
     return chunks
@@ -1,29 +1,85 @@
-from nltk import ngrams
+import os
+import heapq
+import math
 from collections import Counter
 
-def extract_keywords(text, top_n=20):
-    
-    tokens = text.split()
+# Ranked terms kept per document (the list later shown to / refined by the LLM)
+KEYWORD_TOP_N = int(os.environ.get("VILO_KEYWORD_TOP_N", "100"))
+# A bigram becomes a keyword only if it occurs this often and its words stick together
+# (normalized PMI in [-1, 1]; 0 = independent, 1 = always together)
+MIN_BIGRAM_COUNT = 2
+MIN_BIGRAM_NPMI = 0.3
+
+
+def count_terms(token_lists, progress=None, total=None):
+    """
+    Count unigrams and bigrams in one pass over a document's chunks (lists of cleaned tokens).
+    Bigrams are keyed "w1 w2" and never span two chunks.
+
+    Returns {"counts": Counter, "doc_freq": Counter, "num_chunks": int, "num_tokens": int};
+    doc_freq is the number of chunks a term occurs in.
+    """
+    counts = Counter()
+    doc_freq = Counter()
+    num_chunks = 0
+    num_tokens = 0
+    for tokens in token_lists:
+        terms = tokens + [f"{w1} {w2}" for w1, w2 in zip(tokens, tokens[1:])]
+        counts.update(terms)
+        doc_freq.update(set(terms))
+        num_chunks += 1
+        num_tokens += len(tokens)
+        if progress:
+            progress(num_chunks, total)
+    return {"counts": counts, "doc_freq": doc_freq, "num_chunks": num_chunks, "num_tokens": num_tokens}
+
 
-    # Unigrams
-    unigram_counts = Counter(tokens)
+def bigram_npmi(count, count_w1, count_w2, num_tokens):
+    """Normalized pointwise mutual information of a bigram from raw counts."""
+    p12 = count / num_tokens
+    if p12 >= 1:
+        return 1.0
+    pmi = math.log(count * num_tokens / (count_w1 * count_w2))
+    return pmi / -math.log(p12)
 
-    # Bigrams
-    bigram_list = list(ngrams(tokens, 2))
-    bigram_counts = Counter(bigram_list)
 
-    final_keywords = []
+def rank_terms(stats, top_n=None, min_bigram_count=MIN_BIGRAM_COUNT, min_npmi=MIN_BIGRAM_NPMI):
+    """
+    Score every term by TF-IDF across chunks, tf * log(1 + num_chunks / df), and return
+    the top_n as [(term, score)], best first.
 
-    for bigram, count in bigram_counts.most_common():
-        w1, w2 = bigram
+    Bigrams must be collocations (min_bigram_count, min_npmi). A word that mostly occurs
+    inside one kept bigram is dropped in favour of the bigram.
+    """
+    top_n = top_n or KEYWORD_TOP_N
+    counts = stats["counts"]
+    doc_freq = stats["doc_freq"]
+    num_chunks = max(stats["num_chunks"], 1)
+    num_tokens = max(stats["num_tokens"], 1)
 
-        # Check if bigram is "strong" compared to each word
-        if count > unigram_counts[w1] * 0.5 and count > unigram_counts[w2] * 0.5:
-            final_keywords.append(f"{w1} {w2}")
-        else:
-            if w1 not in final_keywords:
-                final_keywords.append(w1)
-            if w2 not in final_keywords:
-                final_keywords.append(w2)
+    scores = {}
+    subsumed = set()
+    for term, tf in counts.items():
+        if " " in term:
+            if tf < min_bigram_count:
+                continue
+            w1, w2 = term.split(" ")
+            if w1 == w2 or bigram_npmi(tf, counts[w1], counts[w2], num_tokens) < min_npmi:
+                continue
+            for w in (w1, w2):
+                if tf > counts[w] * 0.5:
+                    subsumed.add(w)
+        scores[term] = tf * math.log(1 + num_chunks / doc_freq[term])
 
-    return final_keywords[:top_n]
\ No newline at end of file
+    candidates = ((score, term) for term, score in scores.items() if term not in subsumed)
+    return [(term, score) for score, term in heapq.nlargest(top_n, candidates)]
+
+
+def extract_corpus_keywords(token_lists, top_n=None, progress=None, total=None):
+    """Ranked [(term, score)] for a whole document, from one pass over its chunks' tokens."""
+    return rank_terms(count_terms(token_lists, progress=progress, total=total), top_n=top_n)
+
+
+def extract_keywords(text, top_n=20):
+    """Top keywords of a single cleaned text."""
+    return [term for term, _ in extract_corpus_keywords([text.split()], top_n=top_n)]
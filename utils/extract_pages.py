@@ -1,5 +0,0 @@
-import re
-
-def extract_pages_from_chunk(chunk_text):
-    pages = re.findall(r"\[PAGE:(\d+)\]", chunk_text)
-    return list(sorted(set(map(int, pages))))
\ No newline at end of file
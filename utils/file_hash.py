@@ -0,0 +1,48 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+# (path, size, mtime) -> digest, so repeated requests for the same upload don't re-read it;
+# least recently used entries are dropped beyond MAX_HASH_CACHE
+MAX_HASH_CACHE = 1024
+_hash_cache = OrderedDict()
+_hash_cache_lock = threading.Lock()
+
+def file_content_hash(file_path, block_size=1 << 20):
+    """
+    Return the SHA-256 hex digest of a file's bytes.
+    """
+    file_path = Path(file_path)
+    stat = file_path.stat()
+    cache_key = (str(file_path.resolve()), stat.st_size, stat.st_mtime_ns)
+    with _hash_cache_lock:
+        if cache_key in _hash_cache:
+            _hash_cache.move_to_end(cache_key)
+            return _hash_cache[cache_key]
+
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+
+    with _hash_cache_lock:
+        _hash_cache[cache_key] = digest.hexdigest()
+        while len(_hash_cache) > MAX_HASH_CACHE:
+            _hash_cache.popitem(last=False)
+    return digest.hexdigest()
+
+
+def atomic_write_bytes(path, data: bytes):
+    """
+    Write bytes to a temp file next to `path` and rename it into place,
+    so readers in other processes never see a half-written file.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return path
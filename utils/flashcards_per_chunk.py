@@ -1,11 +1,14 @@
 import json
 from model_init.model import query_model
+from utils.batched_generation import format_batch_chunks
+
+def flashcard_count(chunk_text):
+    return max(3, min(7, len(chunk_text) // 250))
 
 # Generatelashcards per chunk
 def generate_flashcards_per_chunk(chunk_text, api_key, location=None, history=None):
 
-    text_len = len(chunk_text)
-    num_flashcards = max(3, min(7, text_len // 250))
+    num_flashcards = flashcard_count(chunk_text)
     location_label = f"Location: {location}" if location else ""
 
     prompt = f"""
@@ -47,4 +50,27 @@ def generate_flashcards_per_chunk(chunk_text, api_key, location=None, history=No
         else:
             return []
     except:
-        return []
\ No newline at end of file
+        return []
+
+
+# Flashcards for several chunks in one prompt
+def build_flashcard_batch_prompt(batch):
+    chunks_text = format_batch_chunks(
+        batch, lambda text: f"Create {flashcard_count(text)} flashcards for this chunk.")
+
+    return f"""
+    You are an AI flashcard generator. Below are several text chunks, each with a chunk id.
+    For each chunk, create the requested number of flashcards from that chunk only.
+    Each flashcard has a front (question) and back (answer). Focus on key ideas.
+    Return strictly as a JSON object that maps every chunk id to a JSON array:
+    {{
+        "c1": [
+            {{
+                "front": "Question/term",
+                "back": "Answer/definition"
+            }}
+        ]
+    }}
+
+{chunks_text}
+    """
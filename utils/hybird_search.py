@@ -1,40 +1,105 @@
-from sentence_transformers import SentenceTransformer
-from rank_bm25 import BM25Okapi
 import faiss
 import numpy as np
 from typing import List, Dict
 import re
+from utils.embeddings import encode_texts
+from utils.bm25 import SparseBM25
+from utils.ann_index import build_ann_index, candidate_count, flat_vectors, is_exact, search as ann_search
+
+_TOKEN = re.compile(r'\w+')
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
 
 def build_bm25_index(chunks: List[Dict]):
-    tokenized_texts = []
-    for chunk in chunks:
-        words = re.findall(r'\w+', chunk["text"].lower())
-        tokenized_texts.append(words)
-    bm25 = BM25Okapi(tokenized_texts)
+    tokenized_texts = [tokenize(chunk["text"]) for chunk in chunks]
+    bm25 = SparseBM25(tokenized_texts)
     return bm25, tokenized_texts
 
 
-def build_faiss_index(chunks: List[Dict]):
-    embeddings = np.array([chunk["metadata"]["embedding"] for chunk in chunks], dtype='float32')
-    dimension = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dimension)
-    index.add(embeddings)
-    return index
+def build_faiss_index(chunks: List[Dict], embeddings=None):
+    # Embeddings come from the chunk store matrix when given, else from the inline metadata lists
+    if embeddings is None:
+        embeddings = np.array([chunk["metadata"]["embedding"] for chunk in chunks], dtype='float32')
+    else:
+        embeddings = np.array(embeddings, dtype='float32')
+    # Inner product on unit vectors == cosine similarity; re-normalizing also covers older unnormalized caches
+    faiss.normalize_L2(embeddings)
+    # Exact for small documents, HNSW / IVF past the size thresholds in utils.ann_index
+    return build_ann_index(embeddings)
+
+def _minmax_rows(scores):
+    # Per-query min-max scaling to [0, 1]; rows with a single distinct value become all zeros
+    lo = scores.min(axis=1, keepdims=True)
+    span = scores.max(axis=1, keepdims=True) - lo
+    span[span == 0] = 1.0
+    return (scores - lo) / span
+
+
+def dense_scores(queries: List[str], faiss_index, num_chunks: int, query_embeddings=None, top_k: int = None, ef_search: int = None, nprobe: int = None):
+    """
+    Cosine similarity of every query to every chunk, shape (len(queries), num_chunks), in chunk-id order.
+    Exact indexes are scored with one matmul against their stored vectors, no ranking needed.
+    Approximate indexes only return a candidate pool; chunks outside it get the lowest score seen for that query.
+    """
+    if query_embeddings is None:
+        query_embeddings = encode_texts(queries, normalize=True, verbose=False)
+    query_embeddings = np.ascontiguousarray(query_embeddings, dtype='float32')
+    if is_exact(faiss_index):
+        return query_embeddings @ flat_vectors(faiss_index).T
+    k = candidate_count(faiss_index, num_chunks, top_k)
+    D, I = ann_search(faiss_index, query_embeddings, k, ef_search=ef_search, nprobe=nprobe)
+    # FAISS returns hits in rank order (-1 padded); scatter them back by chunk id
+    found = I >= 0
+    row_min = np.where(found, D, np.inf).min(axis=1, keepdims=True)
+    row_min[~np.isfinite(row_min)] = -1.0
+    scores = np.repeat(row_min, num_chunks, axis=1).astype('float32')
+    rows, cols = np.nonzero(found)
+    scores[rows, I[rows, cols]] = D[rows, cols]
+    return scores
+
+
+def bm25_scores(queries: List[str], bm25) -> np.ndarray:
+    """BM25 score of every query against every chunk, shape (len(queries), num_chunks)."""
+    return bm25.get_batch_scores([tokenize(q) for q in queries]).astype('float32', copy=False)
+
+
+def fuse_scores(dense: np.ndarray, sparse: np.ndarray, alpha: float = 0.5) -> np.ndarray:
+    """alpha * dense + (1 - alpha) * BM25, each min-max normalized per row (query)."""
+    return alpha * _minmax_rows(dense) + (1 - alpha) * _minmax_rows(sparse)
+
+
+def hybrid_scores(queries: List[str], chunks: List[Dict], bm25, faiss_index, alpha: float = 0.5, query_embeddings=None, top_k: int = None, ef_search: int = None, nprobe: int = None):
+    """Fused score matrix: alpha * dense + (1 - alpha) * BM25, each min-max normalized per query."""
+    dense = dense_scores(queries, faiss_index, len(chunks), query_embeddings, top_k, ef_search, nprobe)
+    sparse = bm25_scores(queries, bm25)
+    return fuse_scores(dense, sparse, alpha)
 
-def hybrid_search(query: str, chunks: List[Dict], bm25, tokenized_texts, faiss_index, top_k: int = 5, alpha: float = 0.5):
 
-    query_tokens = re.findall(r'\w+', query.lower())
-    bm25_scores = bm25.get_scores(query_tokens)
+def top_k_indices(scores: np.ndarray, top_k: int):
+    """Indices of the top_k highest scores per row, best first, without a full sort."""
+    n = scores.shape[1]
+    if top_k >= n:
+        return np.argsort(-scores, axis=1, kind='stable')
+    part = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind='stable')
+    return np.take_along_axis(part, order, axis=1)
 
 
-    query_emb = model.encode(query).astype('float32').reshape(1, -1)
-    D, I = faiss_index.search(query_emb, len(chunks))
-    faiss_scores = -D.flatten()
+def hybrid_search_batch(queries: List[str], chunks: List[Dict], bm25, tokenized_texts, faiss_index, top_k: int = 5, alpha: float = 0.5, query_embeddings=None, ef_search: int = None, nprobe: int = None) -> List[List[Dict]]:
+    """
+    Run hybrid search for many queries at once; returns one list of chunks per query.
+    ef_search / nprobe tune HNSW / IVF indexes for this call only and are ignored by exact indexes.
+    """
+    queries = list(queries)
+    if not queries or not chunks or top_k <= 0:
+        return [[] for _ in queries]
+    scores = hybrid_scores(queries, chunks, bm25, faiss_index, alpha, query_embeddings, top_k, ef_search, nprobe)
+    top = top_k_indices(scores, top_k)
+    return [[chunks[i] for i in row] for row in top]
 
-    combined_scores = alpha * faiss_scores + (1 - alpha) * bm25_scores
-    top_indices = np.argsort(combined_scores)[::-1][:top_k]
 
-    results = [chunks[i] for i in top_indices]
-    return results
\ No newline at end of file
+def hybrid_search(query: str, chunks: List[Dict], bm25, tokenized_texts, faiss_index, top_k: int = 5, alpha: float = 0.5, ef_search: int = None, nprobe: int = None):
+    return hybrid_search_batch([query], chunks, bm25, tokenized_texts, faiss_index, top_k=top_k, alpha=alpha, ef_search=ef_search, nprobe=nprobe)[0]
@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+import faiss
+from utils.bm25 import SparseBM25
+from utils.single_flight import single_flight
+from utils.artifact_cache import document_dir, get_artifact_cache
+from utils.hybird_search import build_faiss_index, build_bm25_index
+
+# Bump when the on-disk index layout changes so stale indexes are rebuilt
+INDEX_VERSION = 4
+
+# Indexes already loaded in this process, keyed by document hash
+MAX_LOADED_INDEXES = 16
+_loaded_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_index_dir(doc_hash, output_folder):
+    return document_dir(output_folder, doc_hash) / f"index_v{INDEX_VERSION}"
+
+
+def save_indexes(index_dir, faiss_index, bm25):
+    """
+    Persist the FAISS index (native faiss serialization) and the BM25 weight matrix side by side.
+    """
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+
+    tmp_faiss = index_dir / f".faiss.index.{os.getpid()}.{threading.get_ident()}.tmp"
+    faiss.write_index(faiss_index, str(tmp_faiss))
+    os.replace(tmp_faiss, index_dir / "faiss.index")
+
+    bm25.save(index_dir / "bm25.npz")
+
+
+def load_indexes(index_dir, mmap=True):
+    index_dir = Path(index_dir)
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0
+    faiss_index = faiss.read_index(str(index_dir / "faiss.index"), flags)
+    bm25 = SparseBM25.load(index_dir / "bm25.npz")
+    return faiss_index, bm25, None
+
+
+def _load_if_valid(index_dir, num_chunks, mmap):
+    # bm25.npz is written last, so both files present means a complete index
+    if not ((index_dir / "faiss.index").exists() and (index_dir / "bm25.npz").exists()):
+        return None
+    try:
+        indexes = load_indexes(index_dir, mmap=mmap)
+    except Exception as e:
+        print(f"Error loading indexes from {index_dir}: {e}")
+        return None
+    if indexes[0].ntotal != num_chunks:
+        print(f"Index size mismatch in {index_dir}, rebuilding")
+        return None
+    print(f"Loaded indexes from cache: {index_dir}")
+    return indexes
+
+
+def load_or_build_indexes(chunks, doc_hash, output_folder, embeddings=None, mmap=True):
+    """
+    Return (faiss_index, bm25, tokenized_texts) for a document.
+    Tokenized texts are not persisted (BM25 keeps only its weight matrix), so the third element is None.
+    Indexes are looked up in memory, then on disk, and only built when neither has them.
+    `embeddings` (a matrix, or a callable returning one) is only used when the FAISS index
+    has to be built, so pass a callable to avoid loading it on cache hits.
+    """
+    with _lock:
+        cached = _loaded_indexes.get(doc_hash)
+        if cached is not None and cached[0].ntotal == len(chunks):
+            _loaded_indexes.move_to_end(doc_hash)
+            return cached
+
+    index_dir = get_index_dir(doc_hash, output_folder)
+    artifacts = get_artifact_cache(output_folder)
+    indexes = _load_if_valid(index_dir, len(chunks), mmap)
+    if indexes is not None:
+        artifacts.touch(index_dir)
+
+    if indexes is None:
+        # Build once per document across threads and worker processes, re-checking after the wait
+        with single_flight(f"index-{doc_hash}", Path(output_folder) / "locks"):
+            indexes = _load_if_valid(index_dir, len(chunks), mmap)
+            if indexes is None:
+                t0 = time.perf_counter()
+                if callable(embeddings):
+                    embeddings = embeddings()
+                faiss_index = build_faiss_index(chunks, embeddings)
+                bm25, _ = build_bm25_index(chunks)
+                save_indexes(index_dir, faiss_index, bm25)
+                artifacts.record(index_dir, "index", doc_hash, cost=time.perf_counter() - t0)
+                print(f"Saved indexes to cache: {index_dir}")
+                indexes = (faiss_index, bm25, None)
+
+    with _lock:
+        _loaded_indexes[doc_hash] = indexes
+        _loaded_indexes.move_to_end(doc_hash)
+        while len(_loaded_indexes) > MAX_LOADED_INDEXES:
+            _loaded_indexes.popitem(last=False)
+
+    return indexes
+
+
+def forget_indexes(doc_hash):
+    """Drop a document's indexes from the in-process cache (after its files were invalidated)."""
+    with _lock:
+        _loaded_indexes.pop(doc_hash, None)
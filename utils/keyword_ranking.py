@@ -0,0 +1,93 @@
+import os
+import numpy as np
+from utils.embeddings import encode_texts
+from utils.chunking import load_wordsegment
+
+# Maximal marginal relevance trade-off: 1 = pure relevance, 0 = pure diversity
+MMR_LAMBDA = float(os.environ.get("VILO_KEYWORD_MMR_LAMBDA", "0.6"))
+# Share of a candidate's relevance that comes from its TF-IDF score rather than its embedding
+STAT_WEIGHT = 0.3
+
+# Terms per markdown section, as asked of the LLM in refine_keywords_AI
+MAIN_TOPICS = 5
+KEY_TERMS = 15
+TECHNICAL_TERMS = 10
+
+# A term is technical when one of its words is this rare in general English
+# (wordsegment's web corpus counts: "algorithm" ~16M, "enzyme" ~6M, "chloroplast" ~0.3M)
+TECHNICAL_MAX_COUNT = 10_000_000
+
+
+def mmr(vectors, relevance, k, lambda_=None):
+    """
+    Order up to k rows of `vectors` (unit rows) by maximal marginal relevance:
+    each step picks argmax lambda * relevance - (1 - lambda) * max similarity to those already picked.
+    Returns row indices in pick order.
+    """
+    lambda_ = MMR_LAMBDA if lambda_ is None else lambda_
+    n = len(relevance)
+    k = min(k, n)
+    selected = []
+    redundancy = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    for _ in range(k):
+        penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+        scores = np.where(available, lambda_ * relevance - (1 - lambda_) * penalty, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, vectors @ vectors[best])
+    return selected
+
+
+def keyword_relevance(candidate_vectors, chunk_embeddings, stat_scores=None):
+    """
+    Relevance of each candidate to the document: cosine similarity with the centroid of the
+    chunk embeddings, blended with the candidate's TF-IDF score (scaled to [0, 1]).
+    """
+    centroid = np.asarray(chunk_embeddings, dtype=np.float32).mean(axis=0)
+    centroid /= np.linalg.norm(centroid) or 1.0
+    relevance = candidate_vectors @ centroid
+    if stat_scores is not None and len(stat_scores):
+        stat = np.asarray(stat_scores, dtype=np.float32)
+        relevance = (1 - STAT_WEIGHT) * relevance + STAT_WEIGHT * stat / (stat.max() or 1.0)
+    return relevance
+
+
+def is_technical(term):
+    unigrams = load_wordsegment().UNIGRAMS
+    return min(unigrams.get(word, 0) for word in term.split()) < TECHNICAL_MAX_COUNT
+
+
+def rank_keywords(ranked_terms, chunk_embeddings):
+    """
+    Split (term, tfidf_score) candidates into {"Main Topics", "Key Terms", "Technical Terms"}
+    with the local embedding model, no LLM call.
+
+    Candidates are ordered by MMR against the document's chunk embeddings. The first few become
+    the main topics; technical terms are the best remaining ones with a rare word; key terms
+    are the best of the rest.
+    """
+    terms = [term for term, _ in ranked_terms]
+    if not terms or chunk_embeddings is None or not len(chunk_embeddings):
+        return {"Main Topics": [], "Key Terms": terms[:KEY_TERMS], "Technical Terms": []}
+
+    vectors = encode_texts(terms, verbose=False)
+    relevance = keyword_relevance(vectors, chunk_embeddings, [score for _, score in ranked_terms])
+    order = [terms[i] for i in mmr(vectors, relevance, len(terms))]
+
+    main_topics = order[:MAIN_TOPICS]
+    rest = order[MAIN_TOPICS:]
+    technical = [term for term in rest if is_technical(term)][:TECHNICAL_TERMS]
+    key_terms = [term for term in rest if term not in technical][:KEY_TERMS]
+    return {"Main Topics": main_topics, "Key Terms": key_terms, "Technical Terms": technical}
+
+
+def format_keyword_sections(sections):
+    """The same markdown layout refine_keywords_AI asks the LLM for."""
+    blocks = []
+    for title, terms in sections.items():
+        if title == "Main Topics":
+            terms = [term.title() for term in terms]
+        blocks.append(f"## {title}\n" + "\n".join(f"- {term}" for term in terms))
+    return "\n\n".join(blocks)
@@ -0,0 +1,46 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Parallel LLM calls per pipeline; the shared rate limiter in model_init keeps them under the API budget
+DEFAULT_CONCURRENCY = int(os.environ.get("VILO_LLM_CONCURRENCY", "4"))
+
+
+def iter_concurrently(fn, items, max_concurrency=None):
+    """
+    Run fn(item) for every item on a thread pool and yield (index, result) as each one finishes.
+    At most max_concurrency items are in flight; if the consumer stops iterating,
+    items not yet started are never submitted.
+    """
+    items = list(items)
+    max_concurrency = max_concurrency or DEFAULT_CONCURRENCY
+    if not items:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=min(max_concurrency, len(items)))
+    pending = {}
+    next_index = 0
+    try:
+        while next_index < len(items) or pending:
+            while next_index < len(items) and len(pending) < max_concurrency:
+                pending[executor.submit(fn, items[next_index])] = next_index
+                next_index += 1
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                yield pending.pop(future), future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def map_concurrently(fn, items, max_concurrency=None, progress=None):
+    """
+    Run fn(item) for every item on a thread pool and return the results in input order.
+    progress(done, total) is called after each item finishes; if it raises (e.g. a job
+    was cancelled), items not yet started are dropped and the exception propagates.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    for done, (i, result) in enumerate(iter_concurrently(fn, items, max_concurrency), 1):
+        results[i] = result
+        if progress:
+            progress(done, len(items))
+    return results
@@ -1,39 +1,236 @@
-from docling.document_converter import DocumentConverter, PdfFormatOption
-from docling.datamodel.pipeline_options import PdfPipelineOptions, TableStructureOptions
-from docling.datamodel.base_models import InputFormat
-from docling.datamodel.accelerator_options import AcceleratorDevice, AcceleratorOptions
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from utils.file_hash import file_content_hash, atomic_write_bytes
+from utils.single_flight import single_flight
+from utils.artifact_cache import document_dir, get_artifact_cache
 
-def convert_to_markdown(input_file_path: Path, output_folder: Path) -> Path:
+# Converter settings that affect the produced markdown; they are part of the cache key
+CONVERTER_OPTIONS = {
+    "do_ocr": True,
+    "do_table_structure": True,
+    "do_cell_matching": True,
+}
+
+# Written between pages of the exported markdown so chunks can be mapped back to page numbers.
+# It is an HTML comment, so the chunker drops any placeholder that is not replaced first.
+PAGE_BREAK = "<!-- page-break -->"
+
+def _docling_version():
+    try:
+        from importlib.metadata import version
+        return version("docling")
+    except Exception:
+        return "unknown"
+
+
+def conversion_cache_key(input_file_path: Path, options: dict = None) -> str:
     """
-    Converts PDF, DOC, or DOCX to Markdown using Docling.
-    Returns the path to the generated .md file.
+    SHA-256 of the file bytes plus the converter options (and docling version).
     """
+    payload = json.dumps({
+        "file": file_content_hash(input_file_path),
+        "options": options or CONVERTER_OPTIONS,
+        "page_break": PAGE_BREAK,
+        "docling": _docling_version(),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Long-lived DocumentConverters; each one keeps its layout/table models loaded between files
+CONVERTER_POOL_SIZE = max(1, int(os.environ.get("VILO_CONVERTER_POOL_SIZE", "1")))
+
+_idle_converters = queue.Queue()
+_pool_lock = threading.Lock()
+_pool_stats = {
+    "device": None,
+    "num_threads": None,
+    "created": 0,
+    "in_use": 0,
+    "conversions": 0,
+    "conversion_seconds": 0.0,
+    "build_seconds": 0.0,
+    "waits": 0,
+}
+
+
+def detect_accelerator_device() -> str:
+    """
+    Pick the Docling accelerator from the hardware: VILO_CONVERTER_DEVICE if set, else CUDA, then MPS, then CPU.
+    """
+    override = os.environ.get("VILO_CONVERTER_DEVICE")
+    if override:
+        return override.lower()
+    try:
+        import torch
+        if torch.cuda.is_available():
+            return "cuda"
+        if getattr(torch.backends, "mps", None) is not None and torch.backends.mps.is_available():
+            return "mps"
+    except ImportError:
+        pass
+    return "cpu"
+
+
+def converter_threads() -> int:
+    # Split the machine's cores between the pooled converters
+    return max(1, (os.cpu_count() or 1) // CONVERTER_POOL_SIZE)
+
+
+def _build_converter(options: dict):
+    from docling.document_converter import DocumentConverter, PdfFormatOption
+    from docling.datamodel.pipeline_options import PdfPipelineOptions, TableStructureOptions
+    from docling.datamodel.base_models import InputFormat
+    from docling.datamodel.accelerator_options import AcceleratorDevice, AcceleratorOptions
+
+    device = detect_accelerator_device()
+    num_threads = converter_threads()
 
     # 1) Configure PDF options
     pdf_pipeline_options = PdfPipelineOptions(
-        do_ocr=True,
-        do_table_structure=True,
-        table_structure_options=TableStructureOptions(do_cell_matching=True),
+        do_ocr=options["do_ocr"],
+        do_table_structure=options["do_table_structure"],
+        table_structure_options=TableStructureOptions(do_cell_matching=options["do_cell_matching"]),
         accelerator_options=AcceleratorOptions(
-            num_threads=4,
-            device=AcceleratorDevice.CUDA
+            num_threads=num_threads,
+            device=AcceleratorDevice(device)
         )
     )
 
     # 2) Prepare converter and support PDF + DOCX (also handles .doc)
+    t0 = time.perf_counter()
     converter = DocumentConverter(
         format_options={
             InputFormat.PDF: PdfFormatOption(pipeline_options=pdf_pipeline_options)
         }
     )
+    # Load the PDF models now rather than inside the first conversion
+    converter.initialize_pipeline(InputFormat.PDF)
+    elapsed = time.perf_counter() - t0
+
+    with _pool_lock:
+        _pool_stats["device"] = device
+        _pool_stats["num_threads"] = num_threads
+        _pool_stats["build_seconds"] += elapsed
+    print(f"Built DocumentConverter on {device} with {num_threads} threads in {elapsed:.2f}s")
+    return converter
 
+
+@contextmanager
+def pooled_converter():
+    """
+    Borrow a converter from the pool, building one if the pool is not full yet,
+    otherwise waiting for one to be returned.
+    """
+    converter = None
+    try:
+        converter = _idle_converters.get_nowait()
+    except queue.Empty:
+        with _pool_lock:
+            can_build = _pool_stats["created"] < CONVERTER_POOL_SIZE
+            if can_build:
+                # Reserve the slot before building so concurrent callers don't overshoot the pool size
+                _pool_stats["created"] += 1
+        if can_build:
+            try:
+                converter = _build_converter(CONVERTER_OPTIONS)
+            except Exception:
+                with _pool_lock:
+                    _pool_stats["created"] -= 1
+                raise
+        else:
+            with _pool_lock:
+                _pool_stats["waits"] += 1
+            converter = _idle_converters.get()
+
+    with _pool_lock:
+        _pool_stats["in_use"] += 1
+    try:
+        yield converter
+    finally:
+        with _pool_lock:
+            _pool_stats["in_use"] -= 1
+        _idle_converters.put(converter)
+
+
+def warm_converter_pool():
+    """
+    Build every pooled converter up front (call once per worker at startup).
+    """
+    with _pool_lock:
+        missing = CONVERTER_POOL_SIZE - _pool_stats["created"]
+        _pool_stats["created"] += missing
+    for built in range(missing):
+        try:
+            _idle_converters.put(_build_converter(CONVERTER_OPTIONS))
+        except Exception:
+            with _pool_lock:
+                _pool_stats["created"] -= missing - built
+            raise
+
+
+def converter_pool_stats() -> dict:
+    with _pool_lock:
+        stats = dict(_pool_stats)
+    stats["pool_size"] = CONVERTER_POOL_SIZE
+    stats["idle"] = _idle_converters.qsize()
+    stats["avg_conversion_seconds"] = (
+        stats["conversion_seconds"] / stats["conversions"] if stats["conversions"] else None
+    )
+    return stats
+
+
+def _convert_with_docling(input_file_path: Path) -> str:
     # 3) Perform conversion
-    converted_doc = converter.convert(str(input_file_path))
+    with pooled_converter() as converter:
+        t0 = time.perf_counter()
+        converted_doc = converter.convert(str(input_file_path))
+    with _pool_lock:
+        _pool_stats["conversions"] += 1
+        _pool_stats["conversion_seconds"] += time.perf_counter() - t0
+    try:
+        return converted_doc.document.export_to_markdown(page_break_placeholder=PAGE_BREAK)
+    except TypeError:
+        # docling-core releases without page_break_placeholder: no page information
+        return converted_doc.document.export_to_markdown()
+
+
+def convert_to_markdown(input_file_path: Path, output_folder: Path, use_cache: bool = True) -> Path:
+    """
+    Converts PDF, DOC, or DOCX to Markdown using Docling.
+    Returns the path to the generated .md file.
 
-    # 4) Save output
+    Results are cached in <output_folder>/documents/<file hash>/ by file content + converter
+    options, so every pipeline reuses a conversion done once for the same file.
+    """
+    input_file_path = Path(input_file_path)
+    output_folder = Path(output_folder)
     output_folder.mkdir(exist_ok=True)
-    output_path = output_folder / f"{input_file_path.stem}.md"
-    output_path.write_text(converted_doc.document.export_to_markdown(), encoding="utf-8")
 
-    return output_path
+    cache_key = conversion_cache_key(input_file_path)
+    doc_hash = file_content_hash(input_file_path)
+    cache_path = document_dir(output_folder, doc_hash) / f"markdown-{cache_key[:16]}.md"
+    artifacts = get_artifact_cache(output_folder)
+
+    if use_cache and cache_path.exists():
+        print(f"Loading markdown from cache: {cache_path}")
+        artifacts.touch(cache_path)
+        return cache_path
+
+    # One conversion per document across threads and worker processes; requests that
+    # arrive while it runs wait and then read its result from the cache
+    with single_flight(f"convert-{doc_hash}", output_folder / "locks"):
+        if use_cache and cache_path.exists():
+            print(f"Loading markdown converted by a concurrent request: {cache_path}")
+            return cache_path
+        t0 = time.perf_counter()
+        markdown = _convert_with_docling(input_file_path)
+        atomic_write_bytes(cache_path, markdown.encode("utf-8"))
+        artifacts.record(cache_path, "markdown", doc_hash, cost=time.perf_counter() - t0, name=input_file_path.name)
+
+    return cache_path
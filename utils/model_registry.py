@@ -0,0 +1,63 @@
+import os
+import threading
+import time
+
+# Process-wide embedding model settings (env vars, or configure_embedding_model before first use)
+_config = {
+    "model_name": os.environ.get("VILO_EMBEDDING_MODEL", "all-MiniLM-L6-v2"),
+    "device": os.environ.get("VILO_EMBEDDING_DEVICE") or None,  # None lets sentence-transformers pick
+    "num_threads": int(os.environ.get("VILO_EMBEDDING_THREADS", "0")) or None,
+}
+
+_model = None
+_load_seconds = None
+_lock = threading.Lock()
+
+
+def configure_embedding_model(model_name=None, device=None, num_threads=None):
+    """
+    Override the embedding model settings. If the model is already loaded and a
+    setting changes, it is dropped and reloaded on next use.
+    """
+    global _model
+    with _lock:
+        new_config = dict(_config)
+        if model_name is not None:
+            new_config["model_name"] = model_name
+        if device is not None:
+            new_config["device"] = device
+        if num_threads is not None:
+            new_config["num_threads"] = num_threads
+        if new_config != _config:
+            _config.update(new_config)
+            _model = None
+
+
+def get_embedding_model():
+    """
+    Return the shared SentenceTransformer instance, loading it on first use.
+    """
+    global _model, _load_seconds
+    if _model is not None:
+        return _model
+
+    with _lock:
+        if _model is None:
+            t0 = time.perf_counter()
+            if _config["num_threads"]:
+                import torch
+                torch.set_num_threads(_config["num_threads"])
+            from sentence_transformers import SentenceTransformer
+            _model = SentenceTransformer(_config["model_name"], device=_config["device"])
+            _load_seconds = time.perf_counter() - t0
+            print(f"Loaded embedding model {_config['model_name']} in {_load_seconds:.2f}s")
+    return _model
+
+
+def embedding_model_info():
+    return {
+        **_config,
+        "loaded": _model is not None,
+        "load_seconds": _load_seconds,
+        "device_in_use": str(_model.device) if _model is not None else None,
+    }
@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# One lock per key inside this process; the file lock covers other worker processes
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+# Waits longer than this are logged, so duplicate ingestion shows up in the service output
+LOG_WAIT_SECONDS = 0.5
+
+_stats = {"acquired": 0, "waited": 0, "wait_seconds": 0.0}
+_stats_lock = threading.Lock()
+
+
+@contextmanager
+def _thread_lock(key):
+    with _thread_locks_guard:
+        entry = _thread_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _thread_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                _thread_locks.pop(key, None)
+
+
+def _same_file(f, path):
+    # False once the lock file was removed (discard_locks) or replaced since `f` was opened
+    try:
+        return os.path.samestat(os.fstat(f.fileno()), os.stat(path))
+    except FileNotFoundError:
+        return False
+
+
+@contextmanager
+def _file_lock(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if fcntl is not None:
+        while True:
+            f = open(path, "a+b")
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            if _same_file(f, path):
+                break
+            # Removed while we waited on it: holding the old file would split the lock, take the new one
+            f.close()
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            f.close()
+        return
+
+    # Windows: an open lock file cannot be deleted, so it cannot be removed under a waiter
+    with open(path, "a+b") as f:
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                break
+            except OSError:
+                # LK_LOCK gives up after ~10 seconds; keep waiting like flock does
+                continue
+        try:
+            yield
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _remove_idle_lock(path):
+    if fcntl is None:
+        try:
+            path.unlink()
+            return True
+        except OSError:  # open in some process: held or waited on
+            return False
+    try:
+        f = open(path, "r+b")
+    except OSError:
+        return False
+    with f:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:  # work in flight; removed by a later cleanup
+            return False
+        try:
+            if not _same_file(f, path):
+                return False
+            # Waiters that already opened this file see it is gone once they get the lock and retry
+            path.unlink()
+            return True
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def single_flight(key, lock_dir):
+    """
+    Run the enclosed block for `key` in one thread of one process at a time.
+
+    Typical use is check / lock / re-check: look for a cached artifact, and only if it is
+    missing enter single_flight and look again before building it. Callers that waited
+    then find the artifact the first caller produced instead of building it a second time.
+    """
+    t0 = time.perf_counter()
+    with _thread_lock(key), _file_lock(Path(lock_dir) / f"{key}.lock"):
+        waited = time.perf_counter() - t0
+        with _stats_lock:
+            _stats["acquired"] += 1
+            if waited > LOG_WAIT_SECONDS:
+                _stats["waited"] += 1
+                _stats["wait_seconds"] += waited
+        if waited > LOG_WAIT_SECONDS:
+            print(f"Waited {waited:.1f}s for in-flight work on {key}")
+        yield
+
+
+def discard_locks(lock_dir, pattern):
+    """
+    Delete the lock files in `lock_dir` matching `pattern` (e.g. "*-<doc hash>.lock") that nobody
+    holds, so lock files do not pile up for documents that are gone. Returns the number removed.
+    """
+    lock_dir = Path(lock_dir)
+    if not lock_dir.is_dir():
+        return 0
+    return sum(_remove_idle_lock(path) for path in lock_dir.glob(pattern))
+
+
+def single_flight_stats():
+    with _stats_lock:
+        return dict(_stats)
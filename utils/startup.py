@@ -0,0 +1,64 @@
+import importlib
+import os
+import sys
+import threading
+import time
+
+# perf_counter at the time this module was first imported (run_ml_service imports it first)
+PROCESS_T0 = time.perf_counter()
+
+# "lazy" (default): heavy modules are imported by the first request that needs them
+# "eager": everything is imported before the service starts answering
+STARTUP_MODE = os.environ.get("VILO_STARTUP_MODE", "lazy").lower()
+
+_events = {}         # name -> seconds since PROCESS_T0
+_deferred_loads = {} # module name -> {"seconds": import time, "at": seconds since PROCESS_T0}
+_lock = threading.Lock()
+
+
+def mark(name):
+    """Record a named startup milestone."""
+    _events[name] = time.perf_counter() - PROCESS_T0
+
+
+def import_deferred(module_name):
+    """
+    Import a module, recording how long it took the first time.
+    """
+    if module_name in _deferred_loads:
+        return sys.modules[module_name]
+    with _lock:
+        if module_name not in _deferred_loads:
+            t0 = time.perf_counter()
+            importlib.import_module(module_name)
+            _deferred_loads[module_name] = {
+                "seconds": round(time.perf_counter() - t0, 4),
+                "at": round(t0 - PROCESS_T0, 4),
+            }
+            print(f"Loaded {module_name} in {_deferred_loads[module_name]['seconds']:.2f}s")
+    return sys.modules[module_name]
+
+
+def deferred(module_name, attr):
+    """
+    Return a stand-in for `module_name.attr` that imports the module on first call.
+    """
+    def call(*args, **kwargs):
+        return getattr(import_deferred(module_name), attr)(*args, **kwargs)
+    call.__name__ = attr
+    call.__qualname__ = attr
+    return call
+
+
+def preload(module_names):
+    for module_name in module_names:
+        import_deferred(module_name)
+
+
+def startup_report():
+    return {
+        "mode": STARTUP_MODE,
+        "uptime_seconds": round(time.perf_counter() - PROCESS_T0, 4),
+        "events": {name: round(t, 4) for name, t in _events.items()},
+        "deferred_imports": dict(_deferred_loads),
+    }
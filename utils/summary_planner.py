@@ -0,0 +1,71 @@
+import os
+
+# Tokens of document text per summarization prompt (the instruction block comes on top)
+SUMMARY_TOKEN_BUDGET = int(os.environ.get("VILO_SUMMARY_TOKEN_BUDGET", "2500"))
+
+# ~4 characters per token for English text, as in model_init.rate_limit
+CHARS_PER_TOKEN = 4
+
+PACK_SEPARATOR = "\n\n"
+
+# Chunks repeat up to ~100 characters of the previous chunk (the chunker's overlap);
+# repeated prefixes shorter than MIN_OVERLAP are left alone as likely coincidences
+MAX_OVERLAP = 200
+MIN_OVERLAP = 20
+
+
+def count_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def pack_texts(texts, token_budget=None):
+    """
+    Greedily group consecutive texts so each group stays under token_budget.
+    A single text larger than the budget gets a group of its own. Returns a list of joined strings.
+    """
+    token_budget = token_budget or SUMMARY_TOKEN_BUDGET
+    packs = []
+    current = []
+    current_tokens = 0
+    for text in texts:
+        tokens = count_tokens(text)
+        if current and current_tokens + tokens > token_budget:
+            packs.append(PACK_SEPARATOR.join(current))
+            current = []
+            current_tokens = 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        packs.append(PACK_SEPARATOR.join(current))
+    return packs
+
+
+def strip_overlap(previous, text):
+    """Drop the start of `text` that repeats the end of `previous` (the chunk overlap)."""
+    for k in range(min(len(previous), len(text), MAX_OVERLAP), MIN_OVERLAP - 1, -1):
+        if text.startswith(previous[-k:]):
+            return text[k:].lstrip()
+    return text
+
+
+def plan_sections(chunks, token_budget=None):
+    """
+    Group consecutive chunks that share a header path into sections, and split each
+    section into packs that fit the token budget. Chunk overlap is removed first.
+    Returns [{"header": str, "packs": [str, ...]}] in document order.
+    """
+    sections = []
+    previous = ""
+    for i, chunk in enumerate(chunks, 1):
+        header = chunk.get("metadata", {}).get("header", f"Section {i}")
+        # Each chunk's text reaches the LLM once: the overlap with the previous chunk is cut
+        text = strip_overlap(previous, chunk["text"])
+        previous = chunk["text"]
+        if not text:
+            continue
+        if sections and sections[-1]["header"] == header:
+            sections[-1]["texts"].append(text)
+        else:
+            sections.append({"header": header, "texts": [text]})
+
+    return [{"header": s["header"], "packs": pack_texts(s["texts"], token_budget)} for s in sections]
@@ -2,8 +2,6 @@ import re
 from pathlib import Path
 import markdown
 import pdfkit
-from utils.read_file import read_file_to_text
-from utils.chunking import adaptive_chunk_markdown
 from src.Summarize import summarize_pipeline
 
 def normalize_text(text: str) -> str:
@@ -25,18 +23,19 @@ def clean_text(text: str) -> str:
     text = re.sub(r'\s+', ' ', text)
     return text.strip()
 
-def generate_summary_pdf(file_path: str, api_key: str, output_pdf_path: str):
+def generate_summary_pdf(file_path: str, api_key: str, output_pdf_path: str, progress=None):
     """
     Generates a summary PDF from the given file path.
     """
     file_path = Path(file_path)
     output_pdf_path = Path(output_pdf_path)
     
-    # Use summarize_pipeline which now handles caching and header generation
+    # Use summarize_pipeline which now handles caching and header generation.
+    # It stays outside the try below: its errors (and job cancellation) belong to the caller,
+    # only rendering failures are reported as False.
+    full_markdown = summarize_pipeline(file_path, api_key, progress=progress)
+
     try:
-        # This will return the full markdown string (from cache or generated)
-        full_markdown = summarize_pipeline(file_path, api_key)
-        
         # Prepend title if not already present (summarize_pipeline returns just the body)
         # Actually summarize_pipeline returns joined chunks. 
         # We can add a title here.